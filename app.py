@@ -22,6 +22,7 @@ from src.core import (
     get_ai_service_status,
     get_analyst_questions,
     get_table_schemas,
+    group_parquet_tables,
     scan_parquet_files,
 )
 from src.simple_auth import get_auth_service
@@ -379,19 +380,18 @@ def display_results(result_df: pd.DataFrame, title: str, execution_time: float =
         st.warning("⚠️ No results found")
 
 
-@st.cache_data(ttl=3600)  # Cache for 1 hour
+@st.cache_data(ttl=3600, show_spinner="🔄 Loading data files...")  # Cache for 1 hour
 def load_parquet_files():
     """Load and cache parquet files."""
     return scan_parquet_files()
 
 
-@st.cache_data(ttl=3600)  # Cache for 1 hour
-def load_schema_context(_parquet_files):
-    """Load and cache schema context."""
-    return get_table_schemas(_parquet_files)
+def load_schema_context(parquet_files):
+    """Load schema context (cached by get_table_schemas on file mtime and size)."""
+    return get_table_schemas(parquet_files)
 
 
-@st.cache_resource(ttl=3600)  # Cache for 1 hour
+@st.cache_resource(ttl=3600, show_spinner="🔄 Initializing AI services...")  # Cache for 1 hour
 def load_ai_service():
     """Load and cache AI service with adapter pattern."""
     return get_ai_service()
@@ -417,19 +417,16 @@ def initialize_app_data():
 
     # Check if we need to initialize data (avoid reinitializing on every rerun)
     if "app_initialized" not in st.session_state or not st.session_state.app_initialized:
-        # Show spinner only if we're actually loading data
+        # The cached loaders show their own spinner, and only on a cache miss
         if "parquet_files" not in st.session_state:
-            with st.spinner("🔄 Loading data files..."):
-                st.session_state.parquet_files = load_parquet_files()
+            st.session_state.parquet_files = load_parquet_files()
 
         if "schema_context" not in st.session_state:
-            with st.spinner("🔄 Building schema context..."):
-                st.session_state.schema_context = load_schema_context(st.session_state.parquet_files)
+            st.session_state.schema_context = load_schema_context(st.session_state.parquet_files)
 
         if "ai_service" not in st.session_state:
-            with st.spinner("🔄 Initializing AI services..."):
-                st.session_state.ai_service = load_ai_service()
-                st.session_state.ai_available = st.session_state.ai_service.is_available()
+            st.session_state.ai_service = load_ai_service()
+            st.session_state.ai_available = st.session_state.ai_service.is_available()
 
         # Mark as initialized only after all components are loaded
         st.session_state.app_initialized = True
@@ -528,8 +525,12 @@ def main():
                 for provider_key, is_available in status.items():
                     if provider_key != "active":
                         provider_display = provider_key.title()
-                        icon = "✅" if is_available else "❌"
-                        status_text = "Available" if is_available else "Unavailable"
+                        if is_available is None:
+                            # Configured, but its adapter is only built once selected
+                            icon, status_text = "⚪", "Not loaded yet"
+                        else:
+                            icon = "✅" if is_available else "❌"
+                            status_text = "Available" if is_available else "Unavailable"
                         active_marker = " **(Active)**" if provider_key == ai_status["active_provider"] else ""
                         st.markdown(f"- **{provider_display}**: {icon} {status_text}{active_marker}")
         else:
@@ -607,8 +608,7 @@ def main():
         with st.expander("📋 Available Tables", expanded=False):
             parquet_files = st.session_state.get("parquet_files", [])
             if parquet_files:
-                for file_path in parquet_files:
-                    table_name = os.path.splitext(os.path.basename(file_path))[0]
+                for table_name in group_parquet_tables(parquet_files):
                     st.markdown(
                         f"<div style='color: var(--color-text-primary); margin: 0.25rem 0;'>• <span style='font-weight: 500;'>{table_name}</span></div>",
                         unsafe_allow_html=True,
@@ -739,9 +739,20 @@ def main():
 
         if generate_button and is_ai_ready:
             with st.spinner(f"🧠 {provider_name} is analyzing your question..."):
+                # Show the SQL as it streams in; replaced by the final result below
+                stream_placeholder = st.empty()
+                streamed_chunks = []
+
+                def show_partial_sql(text):
+                    streamed_chunks.append(text)
+                    stream_placeholder.code("".join(streamed_chunks), language="sql")
+
                 start_time = time.time()
-                sql_query, error_msg = generate_sql_with_ai(user_question, st.session_state.get("schema_context", ""))
+                sql_query, error_msg = generate_sql_with_ai(
+                    user_question, st.session_state.get("schema_context", ""), on_token=show_partial_sql
+                )
                 ai_generation_time = time.time() - start_time
+                stream_placeholder.empty()
                 st.session_state.generated_sql = sql_query
                 st.session_state.ai_error = error_msg
                 # Hide Edit panel on fresh generation to avoid empty editor gaps
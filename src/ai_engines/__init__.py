@@ -1,12 +1,27 @@
 """
 converSQL AI Engine Adapters
 Modular adapter pattern for multiple AI providers.
+
+Adapters are imported lazily (PEP 562) so that only the providers a caller
+actually touches pay their import cost.
 """
 
+import importlib
+from typing import TYPE_CHECKING, Any
+
 from .base import AIEngineAdapter
-from .bedrock_adapter import BedrockAdapter
-from .claude_adapter import ClaudeAdapter
-from .gemini_adapter import GeminiAdapter
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .bedrock_adapter import BedrockAdapter
+    from .claude_adapter import ClaudeAdapter
+    from .gemini_adapter import GeminiAdapter
+
+# Adapter class name -> submodule that defines it
+_ADAPTER_MODULES = {
+    "BedrockAdapter": "bedrock_adapter",
+    "ClaudeAdapter": "claude_adapter",
+    "GeminiAdapter": "gemini_adapter",
+}
 
 __all__ = [
     "AIEngineAdapter",
@@ -14,3 +29,19 @@ __all__ = [
     "ClaudeAdapter",
     "GeminiAdapter",
 ]
+
+
+def __getattr__(name: str) -> Any:
+    """Import adapter classes on first access."""
+    module_name = _ADAPTER_MODULES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    adapter_class = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    globals()[name] = adapter_class
+    return adapter_class
+
+
+def __dir__():
+    """Include lazily loaded adapters in ``dir()``."""
+    return sorted(set(globals()) | set(__all__))
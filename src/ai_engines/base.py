@@ -3,10 +3,92 @@ Base AI Engine Adapter Interface
 Defines the contract for all AI engine adapters in converSQL.
 """
 
+import asyncio
 import os
+import re
 import time
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from ..prompts import split_sql_generation_prompt
+
+# Fenced code blocks in AI responses; the closing fence is optional for truncated output
+_FENCE_RE = re.compile(r"```[ \t]*(sql\b)?\s*(.*?)(?:```|\Z)", re.DOTALL | re.IGNORECASE)
+
+# Lead-in phrases some models put before the SQL ("Here's the SQL query:", "Query:", ...)
+_RESPONSE_PREFIX_RE = re.compile(r"(?:here(?:'s|\s+is)\s+the\s+)?(?:sql\s+)?query\s*:", re.IGNORECASE)
+
+# Statements a generated query may start with
+_SQL_KEYWORDS = ("select", "insert", "update", "delete", "create", "drop", "with")
+
+# Potentially destructive operations (warned about, not blocked)
+_DANGEROUS_RE = re.compile(r"\b(?:drop|delete|truncate|alter)\b", re.IGNORECASE)
+
+# Provider error categories, matched in one pass over the error text
+_API_ERROR_RE = re.compile(
+    r"(?P<auth>api[_ ]key|authentication|credentials|access denied)"
+    r"|(?P<rate_limit>quota|\brate|throttl)"
+    r"|(?P<safety>safety|blocked)"
+    r"|(?P<model>model)",
+    re.IGNORECASE,
+)
+_API_ERROR_PRIORITY = ("auth", "rate_limit", "safety", "model")
+
+# Receives each chunk of response text as it streams in from a provider
+TokenCallback = Callable[[str], None]
+
+
+def classify_api_error(error: Any, categories: Optional[Iterable[str]] = None) -> Optional[str]:
+    """
+    Classify a provider error message for user-facing hints.
+
+    Args:
+        error: Exception or message text
+        categories: Categories the caller has hints for (default: all)
+
+    Returns:
+        The highest-priority matching category ("auth", "rate_limit", "safety"
+        or "model"), or None if nothing matched
+    """
+    found = {match.lastgroup for match in _API_ERROR_RE.finditer(str(error))}
+    allowed = _API_ERROR_PRIORITY if categories is None else tuple(categories)
+    for category in _API_ERROR_PRIORITY:
+        if category in found and category in allowed:
+            return category
+    return None
+
+
+def anthropic_prompt_fields(prompt: str, cache: bool = True) -> Dict[str, Any]:
+    """
+    Build the ``system``/``messages`` fields of an Anthropic Messages request.
+
+    Prompts from build_sql_generation_prompt are split so the static guidance
+    becomes the system prompt and the schema and question separate user
+    content blocks. With ``cache``, cache breakpoints after the guidance and
+    after the schema let the API reuse both prefixes across questions. Other
+    prompts are sent as a single user message.
+
+    Args:
+        prompt: Complete prompt with schema and question
+        cache: Whether to mark the static prefixes with cache_control
+
+    Returns:
+        Dict[str, Any]: Request fields to merge into the request
+    """
+    parts = split_sql_generation_prompt(prompt)
+    if parts is None:
+        return {"messages": [{"role": "user", "content": prompt}]}
+
+    guidance, schema_part, question_part = parts
+    system_block: Dict[str, Any] = {"type": "text", "text": guidance}
+    schema_block: Dict[str, Any] = {"type": "text", "text": schema_part}
+    if cache:
+        system_block["cache_control"] = {"type": "ephemeral"}
+        schema_block["cache_control"] = {"type": "ephemeral"}
+    return {
+        "system": [system_block],
+        "messages": [{"role": "user", "content": [schema_block, {"type": "text", "text": question_part}]}],
+    }
 
 
 class AIEngineAdapter(ABC):
@@ -70,15 +152,16 @@ class AIEngineAdapter(ABC):
         pass
 
     @abstractmethod
-    def _generate_sql_impl(self, prompt: str) -> Tuple[str, str]:
+    def _generate_sql_impl(self, prompt: str, on_token: Optional[TokenCallback] = None) -> Tuple[str, str]:
         """
         Internal implementation of SQL generation.
 
-        To be implemented by subclasses.
+        To be implemented by subclasses. Adapters that stream responses should
+        pass each text chunk to ``on_token`` as it arrives.
         """
         raise NotImplementedError("Subclasses must implement _generate_sql_impl")
 
-    def generate_sql(self, prompt: str) -> Tuple[str, str]:
+    def generate_sql(self, prompt: str, on_token: Optional[TokenCallback] = None) -> Tuple[str, str]:
         """
         Generate SQL query from natural language prompt.
 
@@ -88,6 +171,8 @@ class AIEngineAdapter(ABC):
         Args:
             prompt: Complete prompt including schema context, business rules,
                    ontological information, and user question
+            on_token: Optional callback receiving raw response text chunks as
+                   they stream in, for progressive display
 
         Returns:
             Tuple[str, str]: (sql_query, error_message)
@@ -109,7 +194,7 @@ class AIEngineAdapter(ABC):
 
         try:
             # Generate SQL and record the request
-            sql_query, error_msg = self._generate_sql_impl(prompt)
+            sql_query, error_msg = self._generate_sql_impl(prompt, on_token)
             if sql_query and not error_msg:
                 self._record_request()
             return sql_query, error_msg
@@ -118,6 +203,21 @@ class AIEngineAdapter(ABC):
             error_msg = f"Error generating SQL: {str(e)}"
             return "", error_msg
 
+    async def generate_sql_async(self, prompt: str) -> Tuple[str, str]:
+        """
+        Asynchronous variant of generate_sql.
+
+        The provider SDK call runs in a worker thread, so many requests can be
+        in flight at once from a single event loop (e.g. with asyncio.gather).
+
+        Args:
+            prompt: Complete prompt including schema context and user question
+
+        Returns:
+            Tuple[str, str]: (sql_query, error_message)
+        """
+        return await asyncio.to_thread(self.generate_sql, prompt)
+
     # Implementation for _generate_sql_impl moved to abstract method above
 
     @property
@@ -203,18 +303,13 @@ class AIEngineAdapter(ABC):
         if not sql or not sql.strip():
             return False, "Empty SQL query generated"
 
-        sql_lower = sql.lower().strip()
-
-        # Check for common SQL keywords
-        sql_keywords = ["select", "insert", "update", "delete", "create", "drop", "with"]
-        has_sql_keyword = any(sql_lower.startswith(keyword) for keyword in sql_keywords)
-
-        if not has_sql_keyword:
+        # Check for common SQL keywords (only the leading token matters)
+        head = sql.lstrip()[:16].lower()
+        if not head.startswith(_SQL_KEYWORDS):
             return False, "Generated text does not appear to be valid SQL"
 
         # Warn about dangerous operations (but don't block)
-        dangerous_keywords = ["drop", "delete", "truncate", "alter"]
-        if any(keyword in sql_lower for keyword in dangerous_keywords):
+        if _DANGEROUS_RE.search(sql):
             return True, "Warning: Query contains potentially destructive operations"
 
         return True, ""
@@ -239,30 +334,17 @@ class AIEngineAdapter(ABC):
 
         # Remove markdown code blocks
         if "```" in sql:
-            # Extract content between ```sql and ``` or ``` and ```
-            parts = sql.split("```")
-            for i, part in enumerate(parts):
-                part = part.strip()
-                if part.startswith("sql"):
-                    sql = part[3:].strip()
-                    break
-                elif i > 0 and (part.upper().startswith("SELECT") or part.upper().startswith("WITH")):
-                    sql = part.strip()
+            # Take the first block tagged as sql or starting with SELECT/WITH
+            for match in _FENCE_RE.finditer(sql):
+                block = match.group(2).strip()
+                if match.group(1) or block[:6].upper().startswith(("SELECT", "WITH")):
+                    sql = block
                     break
 
-        # Remove common AI response patterns
-        prefixes_to_remove = [
-            "here's the sql query:",
-            "here is the sql query:",
-            "sql query:",
-            "query:",
-        ]
-
-        sql_lower = sql.lower()
-        for prefix in prefixes_to_remove:
-            if sql_lower.startswith(prefix):
-                sql = sql[len(prefix) :].strip()
-                break
+        # Remove common AI response patterns (anchored match, no lowercase copy)
+        prefix_match = _RESPONSE_PREFIX_RE.match(sql)
+        if prefix_match:
+            sql = sql[prefix_match.end() :].strip()
 
         return sql
 
@@ -5,9 +5,81 @@ Implements converSQL adapter interface for Amazon Bedrock.
 
 import json
 import os
+import threading
 from typing import Any, Dict, Optional, Tuple
 
-from .base import AIEngineAdapter
+from .base import AIEngineAdapter, TokenCallback, anthropic_prompt_fields, classify_api_error
+
+try:  # Optional: orjson encodes/decodes request and stream payloads several times faster
+    import orjson
+except ImportError:  # pragma: no cover - stdlib fallback
+    orjson = None  # type: ignore[assignment]
+
+
+def _json_dumps(payload: Dict[str, Any]) -> Any:
+    """Serialize a request body (bytes with orjson, str with the stdlib)."""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload)
+
+
+def _json_loads(data: Any) -> Any:
+    """Parse a JSON payload from bytes or str."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+# Hints appended to API errors, by classify_api_error category
+_ERROR_HINTS = {
+    "auth": "Check AWS credentials (aws configure) or IAM permissions",
+    "rate_limit": "API rate limit exceeded. Try again in a moment",
+    "model": "Model {model_id} may not be available in {region}",
+}
+
+# Shared across adapter instances: building a boto3 Session loads endpoint and
+# service metadata, so create it (and one runtime client per region) only once.
+_SESSION: Optional[Any] = None
+_RUNTIME_CLIENTS: Dict[str, Any] = {}
+_CLIENT_LOCK = threading.RLock()
+
+# HTTP connections kept open per runtime client; botocore's default of 10
+# queues concurrent requests (e.g. batch generation) behind each other
+MAX_POOL_CONNECTIONS = int(os.getenv("BEDROCK_MAX_POOL_CONNECTIONS", "64"))
+
+# Mark the static prompt prefix for Bedrock prompt caching; opt-in because
+# only some Claude models on Bedrock accept cache_control
+PROMPT_CACHE_ENABLED = os.getenv("BEDROCK_PROMPT_CACHE", "false").lower() == "true"
+
+
+def _get_session() -> Any:
+    """Return the process-wide boto3 Session, creating it on first use."""
+    global _SESSION
+    with _CLIENT_LOCK:
+        if _SESSION is None:
+            import boto3
+
+            _SESSION = boto3.Session()
+        return _SESSION
+
+
+def _get_runtime_client(region: str) -> Any:
+    """Return the shared bedrock-runtime client for a region."""
+    with _CLIENT_LOCK:
+        client = _RUNTIME_CLIENTS.get(region)
+        if client is None:
+            from botocore.config import Config
+
+            config = Config(
+                max_pool_connections=MAX_POOL_CONNECTIONS,
+                retries={"max_attempts": 3, "mode": "adaptive"},
+                tcp_keepalive=True,
+                connect_timeout=10,
+                read_timeout=60,
+            )
+            client = _get_session().client("bedrock-runtime", region_name=region, config=config)
+            _RUNTIME_CLIENTS[region] = client
+        return client
 
 
 class BedrockAdapter(AIEngineAdapter):
@@ -29,6 +101,8 @@ class BedrockAdapter(AIEngineAdapter):
                 - enable: Whether Bedrock is enabled (default True)
                 - guardrail_id: Optional Bedrock Guardrail ID
                 - guardrail_version: Optional Bedrock Guardrail version
+                - verify_on_init: Probe Bedrock with a live API call during
+                  initialization (default from BEDROCK_VERIFY_ON_INIT, off)
         """
         self.client: Optional[Any] = None
         self.model_id: Optional[str] = None
@@ -53,12 +127,11 @@ class BedrockAdapter(AIEngineAdapter):
         self.guardrail_version = self.config.get("guardrail_version", os.getenv("BEDROCK_GUARDRAIL_VERSION", "DRAFT"))
 
         try:
-            import boto3
             from botocore.exceptions import NoCredentialsError, PartialCredentialsError
 
             # Check if AWS credentials are available
             try:
-                session = boto3.Session()
+                session = _get_session()
                 credentials = session.get_credentials()
                 if credentials is None:
                     print("⚠️ No AWS credentials found for Bedrock")
@@ -82,23 +155,25 @@ class BedrockAdapter(AIEngineAdapter):
                 self.client = None
                 return
 
-            # Initialize Bedrock runtime client
-            self.client = boto3.client("bedrock-runtime", region_name=self.region)
+            # Reuse the shared Bedrock runtime client for this region
+            region = self.region or "us-west-2"
+            self.client = _get_runtime_client(region)
+
+            # Credential problems surface on the first invoke_model call; the live
+            # probe below costs a network round-trip and is opt-in for debugging.
+            if self.config.get("verify_on_init", os.getenv("BEDROCK_VERIFY_ON_INIT", "false").lower() == "true"):
+                try:
+                    # We use the bedrock (not runtime) client for this test
+                    bedrock_client = session.client("bedrock", region_name=region)
+                    bedrock_client.list_foundation_models(maxResults=1)
+                except Exception as e:
+                    # Credentials exist but are invalid (expired, wrong permissions, etc)
+                    print(f"⚠️ AWS Bedrock credentials are invalid: {e}")
+                    print("   Your AWS credentials exist but cannot access Bedrock services")
+                    self.client = None
+                    return
 
-            # Test credentials with a simple API call to verify they actually work
-            try:
-                # Try to list models - this will fail fast if credentials are invalid
-                # We use the bedrock (not runtime) client for this test
-                bedrock_client = boto3.client("bedrock", region_name=self.region)
-                # Just call the API - if credentials are bad, this will raise an exception
-                bedrock_client.list_foundation_models(maxResults=1)
-                print(f"✅ AWS Bedrock initialized successfully in {self.region}")
-            except Exception as e:
-                # Credentials exist but are invalid (expired, wrong permissions, etc)
-                print(f"⚠️ AWS Bedrock credentials are invalid: {e}")
-                print("   Your AWS credentials exist but cannot access Bedrock services")
-                self.client = None
-                return
+            print(f"✅ AWS Bedrock initialized successfully in {self.region}")
 
         except ImportError:
             print("⚠️ boto3 not installed. Run: pip install boto3")
@@ -112,12 +187,16 @@ class BedrockAdapter(AIEngineAdapter):
         """Check if Bedrock client is initialized and ready."""
         return self.client is not None and self.model_id is not None
 
-    def _generate_sql_impl(self, prompt: str) -> Tuple[str, str]:
+    def _generate_sql_impl(self, prompt: str, on_token: Optional[TokenCallback] = None) -> Tuple[str, str]:
         """
         Generate SQL using Amazon Bedrock.
 
+        The response is streamed with invoke_model_with_response_stream so text
+        is available (and forwarded to ``on_token``) as soon as it is generated.
+
         Args:
             prompt: Complete prompt with schema and question
+            on_token: Optional callback receiving text chunks as they arrive
 
         Returns:
             Tuple[str, str]: (sql_query, error_message)
@@ -131,17 +210,17 @@ class BedrockAdapter(AIEngineAdapter):
                 "anthropic_version": "bedrock-2023-05-31",
                 "max_tokens": 4000,
                 "temperature": 0.0,  # Deterministic for SQL generation
-                "messages": [{"role": "user", "content": prompt}],
+                **anthropic_prompt_fields(prompt, cache=PROMPT_CACHE_ENABLED),
             }
 
-            # Prepare invoke_model parameters
+            # Prepare invoke parameters
             model_id = self.model_id
             if model_id is None:
                 return "", "Bedrock client not available. Check AWS configuration."
 
             invoke_params = {
                 "modelId": model_id,
-                "body": json.dumps(request_body),
+                "body": _json_dumps(request_body),
                 "contentType": "application/json",
                 "accept": "application/json",
             }
@@ -159,14 +238,11 @@ class BedrockAdapter(AIEngineAdapter):
             if client is None:
                 return "", "Bedrock client not available. Check AWS credentials and configuration."
 
-            response = client.invoke_model(**invoke_params)
-
-            # Parse response
-            response_body = json.loads(response["body"].read())
+            response = client.invoke_model_with_response_stream(**invoke_params)
+            raw_sql = self._read_response_stream(response["body"], on_token)
 
             # Extract SQL from response
-            if "content" in response_body and len(response_body["content"]) > 0:
-                raw_sql = response_body["content"][0]["text"]
+            if raw_sql:
                 sql_query = self.clean_sql_response(raw_sql)
 
                 # Validate response
@@ -182,16 +258,43 @@ class BedrockAdapter(AIEngineAdapter):
             error_msg = f"Bedrock API error: {str(e)}"
 
             # Provide helpful error messages for common issues
-            error_lower = str(e).lower()
-            if "credentials" in error_lower or "access denied" in error_lower:
-                error_msg += "\nCheck AWS credentials (aws configure) or IAM permissions"
-            elif "throttling" in error_lower or "rate" in error_lower:
-                error_msg += "\nAPI rate limit exceeded. Try again in a moment"
-            elif "model" in error_lower:
-                error_msg += f"\nModel {self.model_id} may not be available in {self.region}"
+            category = classify_api_error(e, _ERROR_HINTS)
+            if category:
+                error_msg += "\n" + _ERROR_HINTS[category].format(model_id=self.model_id, region=self.region)
 
             return "", error_msg
 
+    @staticmethod
+    def _read_response_stream(event_stream: Any, on_token: Optional[TokenCallback] = None) -> str:
+        """
+        Collect the text of a Bedrock Anthropic-format response stream.
+
+        Args:
+            event_stream: The ``body`` of an invoke_model_with_response_stream response
+            on_token: Optional callback receiving text chunks as they arrive
+
+        Returns:
+            str: Concatenated response text
+        """
+        parts = []
+        for event in event_stream:
+            chunk = event.get("chunk")
+            if chunk is None:
+                # Error events (throttlingException, modelStreamErrorException, ...) replace the chunk
+                error_type, error_body = next(iter(event.items()), ("unknownError", {}))
+                message = error_body.get("message", "") if isinstance(error_body, dict) else str(error_body)
+                raise RuntimeError(f"{error_type}: {message}")
+
+            payload = _json_loads(chunk["bytes"])
+            if payload.get("type") == "content_block_delta":
+                text = payload.get("delta", {}).get("text", "")
+                if text:
+                    parts.append(text)
+                    if on_token is not None:
+                        on_token(text)
+
+        return "".join(parts)
+
     @property
     def name(self) -> str:
         """Display name for this engine."""
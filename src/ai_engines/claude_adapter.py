@@ -3,10 +3,34 @@ Claude API AI Engine Adapter
 Implements converSQL adapter interface for Anthropic Claude API.
 """
 
+import importlib.util
 import os
 from typing import Any, Dict, Optional, Tuple
 
-from .base import AIEngineAdapter
+from .base import AIEngineAdapter, TokenCallback, anthropic_prompt_fields, classify_api_error
+
+# Hints appended to API errors, by classify_api_error category
+_ERROR_HINTS = {
+    "auth": "Check CLAUDE_API_KEY environment variable",
+    "rate_limit": "API rate limit or quota exceeded",
+    "model": "Model {model} may not be available or accessible",
+}
+
+# Keep idle connections (and their TLS sessions) open between user queries;
+# the SDK default drops them after 5 seconds
+KEEPALIVE_EXPIRY = float(os.getenv("CLAUDE_KEEPALIVE_EXPIRY", "60"))
+
+
+def _build_http_client(anthropic: Any) -> Any:
+    """Build the HTTP client for the Anthropic SDK with keep-alive tuning.
+
+    HTTP/2 (many concurrent requests over one connection) is enabled when the
+    optional ``h2`` package is installed.
+    """
+    # Limits class of whichever httpx build the installed SDK uses
+    limits_class = type(anthropic.DEFAULT_CONNECTION_LIMITS)
+    limits = limits_class(max_connections=128, max_keepalive_connections=64, keepalive_expiry=KEEPALIVE_EXPIRY)
+    return anthropic.DefaultHttpxClient(limits=limits, http2=importlib.util.find_spec("h2") is not None)
 
 
 class ClaudeAdapter(AIEngineAdapter):
@@ -46,18 +70,8 @@ class ClaudeAdapter(AIEngineAdapter):
         try:
             import anthropic
 
-            # Initialize Claude client
-            self.client = anthropic.Anthropic(api_key=self.api_key)
-
-            # Optional: Test connection with minimal request
-            # If test fails, still keep client - it might work for actual requests
-            try:
-                self.client.messages.create(
-                    model=self.model, max_tokens=10, messages=[{"role": "user", "content": "test"}]
-                )
-            except Exception:
-                # Keep client - API key might be valid but test failed
-                pass
+            # Initialize Claude client (local only - no request is sent until SQL is generated)
+            self.client = anthropic.Anthropic(api_key=self.api_key, http_client=_build_http_client(anthropic))
 
         except ImportError:
             print("⚠️ anthropic package not installed. Run: pip install anthropic")
@@ -71,12 +85,38 @@ class ClaudeAdapter(AIEngineAdapter):
         """Check if Claude API client is initialized and ready."""
         return self.client is not None and self.api_key is not None and self.model is not None
 
-    def _generate_sql_impl(self, prompt: str) -> Tuple[str, str]:
+    def ping(self) -> Tuple[bool, str]:
+        """
+        Verify the API key and model with a minimal live request.
+
+        Intended for explicit health checks only; it costs a round-trip and a
+        few tokens, so it is never called during initialization.
+
+        Returns:
+            Tuple[bool, str]: (is_reachable, error_message)
+        """
+        client = self.client
+        if client is None or self.model is None:
+            return False, "Claude API not available. Check CLAUDE_API_KEY configuration."
+
+        try:
+            client.messages.create(model=self.model, max_tokens=10, messages=[{"role": "user", "content": "test"}])
+            return True, ""
+        except Exception as e:
+            return False, f"Claude API error: {str(e)}"
+
+    def _generate_sql_impl(self, prompt: str, on_token: Optional[TokenCallback] = None) -> Tuple[str, str]:
         """
         Generate SQL using Claude API.
 
+        The response is streamed so text is available (and forwarded to
+        ``on_token``) as soon as it is generated. The static guidance and the
+        schema are marked for prompt caching, so repeat questions against the
+        same schema only pay full price for the question.
+
         Args:
             prompt: Complete prompt with schema and question
+            on_token: Optional callback receiving text chunks as they arrive
 
         Returns:
             Tuple[str, str]: (sql_query, error_message)
@@ -92,16 +132,21 @@ class ClaudeAdapter(AIEngineAdapter):
             if client is None or model is None or max_tokens is None:
                 return "", "Claude API not available. Check CLAUDE_API_KEY configuration."
 
-            response = client.messages.create(
+            parts = []
+            with client.messages.stream(
                 model=model,
                 max_tokens=max_tokens,
                 temperature=0.0,  # Deterministic for SQL generation
-                messages=[{"role": "user", "content": prompt}],
-            )
+                **anthropic_prompt_fields(prompt),
+            ) as stream:
+                for text in stream.text_stream:
+                    parts.append(text)
+                    if on_token is not None:
+                        on_token(text)
 
             # Extract SQL from response
-            if response.content and len(response.content) > 0:
-                raw_sql = response.content[0].text
+            raw_sql = "".join(parts)
+            if raw_sql:
                 sql_query = self.clean_sql_response(raw_sql)
 
                 # Validate response
@@ -117,13 +162,9 @@ class ClaudeAdapter(AIEngineAdapter):
             error_msg = f"Claude API error: {str(e)}"
 
             # Provide helpful error messages for common issues
-            error_lower = str(e).lower()
-            if "api_key" in error_lower or "authentication" in error_lower:
-                error_msg += "\nCheck CLAUDE_API_KEY environment variable"
-            elif "rate" in error_lower or "quota" in error_lower:
-                error_msg += "\nAPI rate limit or quota exceeded"
-            elif "model" in error_lower:
-                error_msg += f"\nModel {model} may not be available or accessible"
+            category = classify_api_error(e, _ERROR_HINTS)
+            if category:
+                error_msg += "\n" + _ERROR_HINTS[category].format(model=model)
 
             return "", error_msg
 
@@ -3,10 +3,41 @@ Google Gemini AI Engine Adapter
 Implements converSQL adapter interface for Google Gemini.
 """
 
+import datetime
+import importlib
+import json
 import os
-from typing import Any, Dict, Optional, Tuple, cast
+import tempfile
+import time
+from typing import Any, ClassVar, Dict, List, Optional, Tuple, cast
 
-from .base import AIEngineAdapter
+from ..prompts import SQL_GENERATION_GUIDANCE, split_sql_generation_prompt
+from .base import AIEngineAdapter, TokenCallback, classify_api_error
+
+try:  # Optional: orjson encodes/decodes Batch API JSONL several times faster
+    import orjson
+except ImportError:  # pragma: no cover - stdlib fallback
+    orjson = None  # type: ignore[assignment]
+
+__all__ = ["GeminiAdapter"]
+
+# Batch API job polling (jobs are scheduled server-side and may take hours)
+BATCH_POLL_INTERVAL = int(os.getenv("GEMINI_BATCH_POLL_SECONDS", "30"))
+BATCH_TIMEOUT = int(os.getenv("GEMINI_BATCH_TIMEOUT", "86400"))
+# Context caching: upload the prompt guidance and schema once per dataset and reference them per request
+CONTEXT_CACHE_ENABLED = os.getenv("GEMINI_CONTEXT_CACHE", "false").lower() == "true"
+CONTEXT_CACHE_TTL = int(os.getenv("GEMINI_CONTEXT_CACHE_TTL", "3600"))
+EMBEDDING_MODEL = os.getenv("GEMINI_EMBEDDING_MODEL", "models/text-embedding-004")
+
+# Hints appended to API errors, by classify_api_error category
+_ERROR_HINTS = {
+    "auth": "Check GOOGLE_API_KEY or GEMINI_API_KEY environment variable",
+    "rate_limit": "API quota exceeded or rate limited",
+    "safety": "Content was blocked by safety filters",
+    "model": "Model may not be available or accessible",
+}
+
+_BATCH_DONE_STATES = ("JOB_STATE_SUCCEEDED", "JOB_STATE_FAILED", "JOB_STATE_CANCELLED", "JOB_STATE_EXPIRED")
 
 
 class GeminiAdapter(AIEngineAdapter):
@@ -17,6 +48,9 @@ class GeminiAdapter(AIEngineAdapter):
     Requires GOOGLE_API_KEY environment variable.
     """
 
+    # google.generativeai module, imported once on first use
+    _genai_module: ClassVar[Optional[Any]] = None
+
     def __init__(self, config: Dict[str, Any] = None):
         """
         Initialize Gemini adapter.
@@ -33,8 +67,20 @@ class GeminiAdapter(AIEngineAdapter):
         self.api_key: Optional[str] = None
         self.max_output_tokens: int = 4000
         self.temperature: float = 0.0
+        self._cached_model: Optional[Any] = None
+        self._cached_schema: Optional[str] = None
+        self._cache_expires_at: float = 0.0
+        self._context_cache_failed = False
+        self._safety_settings: Optional[Dict[str, Any]] = None
         super().__init__(config)
 
+    @classmethod
+    def _get_genai(cls) -> Any:
+        """Return the google.generativeai module, importing it on first use."""
+        if cls._genai_module is None:
+            cls._genai_module = cast(Any, importlib.import_module("google.generativeai"))
+        return cls._genai_module
+
     def _initialize(self) -> None:
         """Initialize Gemini client with Google Generative AI SDK."""
         # Get configuration
@@ -60,34 +106,19 @@ class GeminiAdapter(AIEngineAdapter):
             return
 
         try:
-            import importlib
-
-            genai = cast(Any, importlib.import_module("google.generativeai"))
+            genai = self._get_genai()
 
             # Configure API key
             genai.configure(api_key=self.api_key)
 
             # Initialize model with generation config
-            generation_config: Dict[str, Any] = {
-                "temperature": self.temperature,
-                "max_output_tokens": self.max_output_tokens,
-                "top_p": 0.95,
-                "top_k": 40,
-            }
+            generation_config: Dict[str, Any] = self._generation_config()
 
             model_instance = cast(
                 Any, genai.GenerativeModel(model_name=str(model_name), generation_config=cast(Any, generation_config))
             )
             self.model = model_instance
 
-            # Optional: Test with minimal request to verify model initialization
-            try:
-                model_instance.generate_content("test")
-                # If we get here, the model is working
-            except Exception:
-                # Keep model - might work for actual requests
-                pass
-
         except ImportError:
             print("⚠️ google-generativeai package not installed.")
             print("   Run: pip install google-generativeai")
@@ -101,12 +132,86 @@ class GeminiAdapter(AIEngineAdapter):
         """Check if Gemini client is initialized and ready."""
         return self.model is not None and self.api_key is not None
 
-    def _generate_sql_impl(self, prompt: str) -> Tuple[str, str]:
+    def _generation_config(self) -> Dict[str, Any]:
+        """Generation settings shared by all model instances."""
+        return {
+            "temperature": self.temperature,
+            "max_output_tokens": self.max_output_tokens,
+            "top_p": 0.95,
+            "top_k": 40,
+        }
+
+    def _get_cached_model(self, schema_part: str) -> Optional[Any]:
+        """
+        Return a model bound to server-side cached prompt guidance and schema.
+
+        The guidance alone is below Gemini's minimum cacheable size, so the
+        schema block (stable per dataset) is cached with it. The cache is
+        recreated when the schema changes or shortly before its TTL runs out,
+        so requests only carry the question. Returns None when context caching
+        is disabled or unsupported; that failure is remembered for the life of
+        the adapter.
+        """
+        if not CONTEXT_CACHE_ENABLED or self._context_cache_failed or self.model is None:
+            return None
+
+        now = time.monotonic()
+        if self._cached_model is not None and schema_part == self._cached_schema and now < self._cache_expires_at:
+            return self._cached_model
+
+        try:
+            genai = self._get_genai()
+            cached = genai.caching.CachedContent.create(
+                model=self.get_model_info()["model"],
+                display_name="conversql-sql-guidance",
+                system_instruction=SQL_GENERATION_GUIDANCE,
+                contents=[schema_part],
+                ttl=datetime.timedelta(seconds=CONTEXT_CACHE_TTL),
+            )
+            self._cached_model = genai.GenerativeModel.from_cached_content(
+                cached_content=cached,
+                generation_config=cast(Any, self._generation_config()),
+                safety_settings=self._safety_settings,
+            )
+            self._cached_schema = schema_part
+            # Refresh a minute early so no request references an expired cache
+            self._cache_expires_at = now + max(CONTEXT_CACHE_TTL - 60, 0)
+            return self._cached_model
+        except Exception as e:
+            print(f"⚠️ Gemini context caching unavailable, sending full prompts: {e}")
+            self._context_cache_failed = True
+            self._cached_model = None
+            return None
+
+    def ping(self) -> Tuple[bool, str]:
+        """
+        Verify the API key and model with a metadata lookup.
+
+        Intended for explicit health checks only; it costs a round-trip (but
+        no tokens), so it is never called during initialization.
+
+        Returns:
+            Tuple[bool, str]: (is_reachable, error_message)
+        """
+        if not self.is_available():
+            return False, "Gemini not available. Check GOOGLE_API_KEY configuration."
+
+        try:
+            self._get_genai().get_model(self.get_model_info()["model"])
+            return True, ""
+        except Exception as e:
+            return False, f"Gemini API error: {str(e)}"
+
+    def _generate_sql_impl(self, prompt: str, on_token: Optional[TokenCallback] = None) -> Tuple[str, str]:
         """
         Generate SQL using Google Gemini.
 
+        When ``on_token`` is given the response is streamed and each text
+        chunk is forwarded to it as soon as it is generated.
+
         Args:
             prompt: Complete prompt with schema and question
+            on_token: Optional callback receiving text chunks as they arrive
 
         Returns:
             Tuple[str, str]: (sql_query, error_message)
@@ -120,7 +225,25 @@ class GeminiAdapter(AIEngineAdapter):
             if model is None:
                 return "", "Gemini not available. Check GOOGLE_API_KEY configuration."
 
-            response = model.generate_content(prompt)
+            # With context caching, the guidance and schema are already on the server: send only the question
+            parts = split_sql_generation_prompt(prompt)
+            if parts is not None:
+                _, schema_part, question_part = parts
+                cached_model = self._get_cached_model(schema_part)
+                if cached_model is not None:
+                    model = cached_model
+                    prompt = question_part
+
+            response = model.generate_content(prompt, stream=on_token is not None)
+            if on_token is not None:
+                for chunk in response:
+                    try:
+                        text = chunk.text
+                    except ValueError:
+                        # Chunks without text parts (e.g. a final safety verdict)
+                        continue
+                    if text:
+                        on_token(text)
 
             # Extract text from response
             if response.text:
@@ -146,18 +269,143 @@ class GeminiAdapter(AIEngineAdapter):
             error_msg = f"Gemini API error: {str(e)}"
 
             # Provide helpful error messages for common issues
-            error_lower = str(e).lower()
-            if "api key" in error_lower or "api_key" in error_lower:
-                error_msg += "\nCheck GOOGLE_API_KEY or GEMINI_API_KEY environment variable"
-            elif "quota" in error_lower or "rate limit" in error_lower:
-                error_msg += "\nAPI quota exceeded or rate limited"
-            elif "safety" in error_lower or "blocked" in error_lower:
-                error_msg += "\nContent was blocked by safety filters"
-            elif "model" in error_lower:
-                error_msg += "\nModel may not be available or accessible"
+            category = classify_api_error(e, _ERROR_HINTS)
+            if category:
+                error_msg += f"\n{_ERROR_HINTS[category]}"
 
             return "", error_msg
 
+    def embed_texts(self, texts: List[str]) -> Optional[List[List[float]]]:
+        """
+        Embed texts with the Gemini embedding model in a single request.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            One embedding vector per text, or None if Gemini is unavailable or the call fails
+        """
+        if not texts or not self.is_available():
+            return None
+
+        try:
+            genai = self._get_genai()
+            result = genai.embed_content(model=EMBEDDING_MODEL, content=texts, task_type="semantic_similarity")
+            return result["embedding"]
+        except Exception as e:
+            print(f"⚠️ Gemini embedding failed: {e}")
+            return None
+
+    def generate_sql_batch(self, prompts: List[str]) -> List[Tuple[str, str]]:
+        """
+        Generate SQL for many prompts through the Gemini Batch API.
+
+        Batch jobs run server-side at a reduced price and higher rate limits,
+        but can take minutes to hours, so this is meant for offline workloads
+        (evaluations, backfills). Requires the google-genai package; without it
+        the prompts are sent one at a time through generate_sql.
+
+        Args:
+            prompts: Complete prompts with schema and question
+
+        Returns:
+            List[Tuple[str, str]]: (sql_query, error_message) for each prompt, in input order
+        """
+        if not prompts:
+            return []
+        if not self.is_available():
+            return [("", "Gemini not available. Check GOOGLE_API_KEY configuration.")] * len(prompts)
+
+        try:
+            genai_client = cast(Any, importlib.import_module("google.genai"))
+        except ImportError:
+            return [self.generate_sql(prompt) for prompt in prompts]
+
+        model_name = self.get_model_info()["model"]
+        path = None
+        try:
+            client = genai_client.Client(api_key=self.api_key)
+
+            with tempfile.NamedTemporaryFile("wb", suffix=".jsonl", delete=False) as f:
+                path = f.name
+                f.write(self._build_batch_requests(prompts))
+
+            uploaded = client.files.upload(file=path, config={"mime_type": "jsonl"})
+            batch_job = client.batches.create(model=model_name, src=uploaded.name)
+
+            deadline = time.monotonic() + BATCH_TIMEOUT
+            while batch_job.state.name not in _BATCH_DONE_STATES:
+                if time.monotonic() > deadline:
+                    return [("", f"Gemini batch job {batch_job.name} timed out")] * len(prompts)
+                time.sleep(BATCH_POLL_INTERVAL)
+                batch_job = client.batches.get(name=batch_job.name)
+
+            if batch_job.state.name != "JOB_STATE_SUCCEEDED":
+                return [("", f"Gemini batch job ended in state {batch_job.state.name}")] * len(prompts)
+
+            results = client.files.download(file=batch_job.dest.file_name)
+            return self._parse_batch_results(results, len(prompts))
+
+        except Exception as e:
+            return [("", f"Gemini batch API error: {str(e)}")] * len(prompts)
+        finally:
+            if path is not None:
+                os.unlink(path)
+
+    def _build_batch_requests(self, prompts: List[str]) -> bytes:
+        """Serialize prompts as Batch API JSONL, keyed by their position."""
+        generation_config = self._generation_config()
+        dumps = orjson.dumps if orjson is not None else (lambda record: json.dumps(record).encode())
+        lines = [
+            dumps(
+                {
+                    "key": f"req_{i}",
+                    "request": {
+                        "contents": [{"role": "user", "parts": [{"text": prompt}]}],
+                        "generation_config": generation_config,
+                    },
+                }
+            )
+            for i, prompt in enumerate(prompts)
+        ]
+        return b"\n".join(lines) + b"\n"
+
+    def _parse_batch_results(self, results: Any, count: int) -> List[Tuple[str, str]]:
+        """Map Batch API JSONL output back to (sql, error) tuples in request order."""
+        if isinstance(results, str):
+            results = results.encode("utf-8")
+        # Both parsers accept bytes, so lines are never decoded to str first
+        loads = orjson.loads if orjson is not None else json.loads
+
+        outputs: List[Tuple[str, str]] = [("", "Gemini batch returned no result for this request")] * count
+        for line in results.splitlines():
+            if not line.strip():
+                continue
+            record = loads(line)
+            key = record.get("key", "")
+            if not key.startswith("req_"):
+                continue
+            index = int(key[4:])
+            if not 0 <= index < count:
+                continue
+
+            if "error" in record:
+                outputs[index] = ("", f"Gemini API error: {record['error'].get('message', record['error'])}")
+                continue
+
+            candidates = record.get("response", {}).get("candidates") or []
+            parts = candidates[0].get("content", {}).get("parts", []) if candidates else []
+            raw_sql = "".join(part.get("text", "") for part in parts)
+            if not raw_sql:
+                outputs[index] = ("", "Gemini returned empty response")
+                continue
+
+            sql_query = self.clean_sql_response(raw_sql)
+            is_valid, validation_msg = self.validate_response(sql_query)
+            outputs[index] = (sql_query, "") if is_valid else ("", f"Invalid SQL generated: {validation_msg}")
+
+        return outputs
+
     @property
     def name(self) -> str:
         """Display name for this engine."""
@@ -206,19 +454,15 @@ class GeminiAdapter(AIEngineAdapter):
             return
 
         try:
-            import importlib
-
-            genai = cast(Any, importlib.import_module("google.generativeai"))
+            genai = self._get_genai()
 
             # Reconstruct model with new safety settings
-            generation_config: Dict[str, Any] = {
-                "temperature": self.temperature,
-                "max_output_tokens": self.max_output_tokens,
-                "top_p": 0.95,
-                "top_k": 40,
-            }
+            generation_config: Dict[str, Any] = self._generation_config()
 
             model_name = model.model_name if hasattr(model, "model_name") else "gemini-1.5-pro"
+            # The context-cached model was built with the old settings
+            self._safety_settings = safety_settings
+            self._cached_model = None
 
             self.model = cast(
                 Any,
@@ -1,17 +1,26 @@
 #!/usr/bin/env python3
 """AI service orchestration for SQL generation providers."""
 
+import asyncio
 import hashlib
+import importlib
+import importlib.util
 import logging
 import os
+import queue
+import sqlite3
+import threading
 import time
-from typing import Any, Dict, Optional, Tuple
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
 
-import streamlit as st
+import numpy as np
 from dotenv import load_dotenv
 
-# Import new adapters
-from src.ai_engines import BedrockAdapter, ClaudeAdapter, GeminiAdapter
+from src.ai_engines import AIEngineAdapter
+from src.ai_engines.base import TokenCallback
 
 try:
     # Prefer new unified prompt builder
@@ -28,8 +37,50 @@ logger = logging.getLogger(__name__)
 AI_PROVIDER = os.getenv("AI_PROVIDER", "claude").lower()
 ENABLE_PROMPT_CACHE = os.getenv("ENABLE_PROMPT_CACHE", "true").lower() == "true"
 PROMPT_CACHE_TTL = int(os.getenv("PROMPT_CACHE_TTL", "3600"))
+PROMPT_CACHE_MAX_ENTRIES = int(os.getenv("PROMPT_CACHE_MAX_ENTRIES", "1000"))
+PROMPT_CACHE_DB = os.getenv("PROMPT_CACHE_DB", "")  # SQLite file for the persistent tier; empty disables it
+ENABLE_SEMANTIC_CACHE = os.getenv("ENABLE_SEMANTIC_CACHE", "false").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+# Local embedding model for the semantic cache, used when fastembed is installed (otherwise Gemini embeddings)
+SEMANTIC_CACHE_MODEL = os.getenv("SEMANTIC_CACHE_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+AI_BATCH_MODE = os.getenv("AI_BATCH_MODE", "false").lower() in ("1", "true")
+BATCH_THRESHOLD = int(os.getenv("AI_BATCH_THRESHOLD", "50"))
 CACHE_VERSION = 1  # bump to invalidate cached AI service instances
 
+SCHEMA_DIGEST_CACHE_SIZE = 8  # distinct schema contexts whose digests are kept
+
+# Provider id -> (adapter class in src.ai_engines, SDK module it needs), in fallback order
+ADAPTER_CLASSES = {
+    "bedrock": ("BedrockAdapter", "boto3"),
+    "claude": ("ClaudeAdapter", "anthropic"),
+    "gemini": ("GeminiAdapter", "google.generativeai"),
+}
+
+# Provider id -> (display name, credential environment variables; any one suffices).
+# Lets the UI list configured providers without importing their SDKs.
+PROVIDER_INFO = {
+    "bedrock": (
+        "Amazon Bedrock",
+        (
+            "AWS_ACCESS_KEY_ID",
+            "AWS_PROFILE",
+            "AWS_WEB_IDENTITY_TOKEN_FILE",
+            "AWS_CONTAINER_CREDENTIALS_RELATIVE_URI",
+            "AWS_CONTAINER_CREDENTIALS_FULL_URI",
+        ),
+    ),
+    "claude": ("Claude API", ("CLAUDE_API_KEY",)),
+    "gemini": ("Google Gemini", ("GOOGLE_API_KEY", "GEMINI_API_KEY")),
+}
+
+# Providers considered for selection, fallback and status (comma-separated; empty = all).
+# Others are only loaded if explicitly selected with set_active_provider.
+AI_PROVIDERS_ENABLED = [
+    provider_id.strip().lower()
+    for provider_id in os.getenv("AI_PROVIDERS_ENABLED", "").split(",")
+    if provider_id.strip()
+]
+
 
 class AIServiceError(Exception):
     """Custom exception for AI service errors."""
@@ -37,39 +88,414 @@ class AIServiceError(Exception):
     pass
 
 
+class PromptCache:
+    """Thread-safe LRU cache of generated SQL with a sliding TTL.
+
+    Lives on the shared AIService instance, so identical questions are served
+    from memory across all Streamlit sessions in the process.
+    """
+
+    def __init__(self, max_entries: int = PROMPT_CACHE_MAX_ENTRIES, ttl: int = PROMPT_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached SQL for key, or None if missing or expired."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            sql_query, expires_at = entry
+            if expires_at <= now:
+                del self._entries[key]
+                return None
+            # Refresh recency and extend the TTL on access
+            self._entries[key] = (sql_query, now + self.ttl)
+            self._entries.move_to_end(key)
+            return sql_query
+
+    def set(self, key: str, sql_query: str) -> None:
+        """Store SQL for key, evicting the least recently used entry when full."""
+        with self._lock:
+            self._entries[key] = (sql_query, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop all cached entries."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DiskPromptCache:
+    """Persistent second tier of the prompt cache, backed by a SQLite file.
+
+    Survives process restarts and is shared by all processes pointing at the
+    same file. Only the cache key (a hash) and the generated SQL are stored,
+    never the prompt. Entries expire PROMPT_CACHE_TTL seconds after they were
+    queued; storage errors are logged and treated as cache misses.
+    """
+
+    PRUNE_EVERY = 100  # writes between sweeps of expired rows
+
+    def __init__(self, path: str, ttl: int = PROMPT_CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # WAL stays consistent without an fsync per commit; a crash can at worst lose recent cache entries
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS prompt_cache (key TEXT PRIMARY KEY, sql TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        # Writes are handed to a background thread so a request never waits on disk I/O;
+        # None is the shutdown sentinel queued by close()
+        self._closed = False
+        self._pending: "queue.Queue[Optional[Tuple[str, str, float]]]" = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="prompt-cache-writer", daemon=True)
+        self._writer.start()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the stored SQL for key, or None if missing or expired."""
+        if self._closed:
+            return None
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT sql FROM prompt_cache WHERE key = ? AND expires_at > ?", (key, time.time())
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning("Prompt cache read failed: %s", e)
+            return None
+        return row[0] if row else None
+
+    def set(self, key: str, sql_query: str) -> None:
+        """Queue SQL for key to be stored by the background writer."""
+        if not self._closed:
+            self._pending.put((key, sql_query, time.time() + self.ttl))
+
+    def flush(self) -> None:
+        """Block until all queued writes have been stored."""
+        if not self._closed:
+            self._pending.join()
+
+    def close(self) -> None:
+        """Store queued writes, stop the writer thread and close the database; later calls are no-ops."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._pending.put(None)
+        self._writer.join()
+        with self._lock:
+            self._conn.close()
+
+    def _write_loop(self) -> None:
+        while True:
+            item = self._pending.get()
+            if item is None:
+                self._pending.task_done()
+                return
+            key, sql_query, expires_at = item
+            try:
+                with self._lock:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO prompt_cache (key, sql, expires_at) VALUES (?, ?, ?)",
+                        (key, sql_query, expires_at),
+                    )
+                    self._writes += 1
+                    if self._writes % self.PRUNE_EVERY == 0:
+                        self._conn.execute("DELETE FROM prompt_cache WHERE expires_at <= ?", (time.time(),))
+            except sqlite3.Error as e:
+                logger.warning("Prompt cache write failed: %s", e)
+            finally:
+                self._pending.task_done()
+
+
+class EmbeddingCache:
+    """Semantic cache matching questions by embedding cosine similarity.
+
+    Catches rephrasings the exact-match PromptCache misses ("top 10 loans by
+    UPB" vs "show me the 10 biggest loans by UPB"). Embeddings are stored
+    L2-normalized in a fixed-size matrix, so a lookup is one matrix-vector
+    product; the oldest entry is overwritten once the cache is full.
+    """
+
+    def __init__(self, threshold: float = SEMANTIC_CACHE_THRESHOLD, max_entries: int = PROMPT_CACHE_MAX_ENTRIES):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._vectors: Optional[np.ndarray] = None
+        self._schema_ids = np.full(max_entries, -1, dtype=np.int32)
+        self._sql: List[str] = [""] * max_entries
+        # Schema key -> id; ids no longer held by any entry are pruned, so this stays bounded too
+        self._schema_keys: Dict[str, int] = {}
+        self._next_schema_id = 0
+        self._size = 0
+        self._next = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(embedding: Any) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else None
+
+    def lookup(self, embedding: Any, schema_key: str) -> Optional[str]:
+        """Return SQL cached for the most similar question on the same schema, if above the threshold."""
+        query = self._normalize(embedding)
+        with self._lock:
+            schema_id = self._schema_keys.get(schema_key)
+            if query is None or schema_id is None or self._vectors is None or self._size == 0:
+                return None
+            if query.shape[0] != self._vectors.shape[1]:
+                return None
+
+            sims = self._vectors[: self._size] @ query
+            sims[self._schema_ids[: self._size] != schema_id] = -1.0
+            best = int(np.argmax(sims))
+            if sims[best] < self.threshold:
+                return None
+            return self._sql[best]
+
+    def add(self, embedding: Any, schema_key: str, sql_query: str) -> None:
+        """Store SQL for a question embedding."""
+        vector = self._normalize(embedding)
+        if vector is None:
+            return
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != vector.shape[0]:
+                # First entry (or embedding model changed): size the matrix to the embedding width
+                self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+                self._size = self._next = 0
+                self._schema_keys.clear()
+
+            schema_id = self._schema_keys.get(schema_key)
+            if schema_id is None:
+                if len(self._schema_keys) >= self.max_entries:
+                    live = set(self._schema_ids[: self._size].tolist())
+                    self._schema_keys = {key: id_ for key, id_ in self._schema_keys.items() if id_ in live}
+                schema_id = self._next_schema_id
+                self._next_schema_id += 1
+                self._schema_keys[schema_key] = schema_id
+            slot = self._next
+            self._vectors[slot] = vector
+            self._schema_ids[slot] = schema_id
+            self._sql[slot] = sql_query
+            self._next = (slot + 1) % self.max_entries
+            self._size = min(self._size + 1, self.max_entries)
+
+    def __len__(self) -> int:
+        return self._size
+
+
+def _load_adapter(provider_id: str) -> AIEngineAdapter:
+    """Import and construct the adapter for a provider."""
+    class_name, _ = ADAPTER_CLASSES[provider_id]
+    adapter_class = getattr(importlib.import_module("src.ai_engines"), class_name)
+    return adapter_class()
+
+
+_LOCAL_EMBEDDER: Optional[Any] = None
+_LOCAL_EMBEDDER_LOCK = threading.Lock()
+
+
+def _get_local_embedder() -> Optional[Any]:
+    """Return the process-wide fastembed model, loading it on first use (None if fastembed is not installed)."""
+    global _LOCAL_EMBEDDER
+    if _LOCAL_EMBEDDER is None:
+        if importlib.util.find_spec("fastembed") is None:
+            return None
+        with _LOCAL_EMBEDDER_LOCK:
+            if _LOCAL_EMBEDDER is None:
+                from fastembed import TextEmbedding
+
+                _LOCAL_EMBEDDER = TextEmbedding(model_name=SEMANTIC_CACHE_MODEL)
+    return _LOCAL_EMBEDDER
+
+
+def _sdk_installed(provider_id: str) -> bool:
+    """Check whether a provider's SDK is importable without importing it."""
+    _, sdk_module = ADAPTER_CLASSES[provider_id]
+    try:
+        return importlib.util.find_spec(sdk_module) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def _provider_configured(provider_id: str) -> bool:
+    """Check whether a built-in provider has credentials set and its SDK installed, without building it."""
+    if provider_id not in PROVIDER_INFO:
+        return False
+    _, credential_vars = PROVIDER_INFO[provider_id]
+    return any(os.getenv(name) for name in credential_vars) and _sdk_installed(provider_id)
+
+
+class LazyAdapters(MutableMapping):
+    """Provider id -> adapter mapping that constructs each adapter on first access.
+
+    Every configured provider is always listed, but its SDK is imported and its
+    client built only when that provider is actually used.
+    """
+
+    def __init__(self, factory: Callable[[str], AIEngineAdapter], provider_ids):
+        self._factory = factory
+        self._provider_ids = list(provider_ids)
+        self._instances: Dict[str, AIEngineAdapter] = {}
+        self._lock = threading.Lock()
+        # One lock per provider so different adapters can be constructed in parallel
+        self._build_locks: Dict[str, threading.Lock] = {}
+        self._failed: Set[str] = set()
+
+    def __getitem__(self, provider_id: str) -> AIEngineAdapter:
+        adapter = self._instances.get(provider_id)
+        if adapter is not None:
+            return adapter
+        if provider_id not in self._provider_ids:
+            raise KeyError(provider_id)
+        with self._lock:
+            build_lock = self._build_locks.setdefault(provider_id, threading.Lock())
+        with build_lock:
+            adapter = self._instances.get(provider_id)
+            if adapter is None:
+                adapter = self._factory(provider_id)
+                self._instances[provider_id] = adapter
+            return adapter
+
+    def load(self, provider_ids: List[str]) -> None:
+        """Construct several adapters concurrently.
+
+        Adapter constructors check credentials and may touch the network, so
+        building them in parallel costs the slowest one rather than the sum.
+        A provider whose adapter fails to construct is logged and left
+        unloaded, so one broken SDK never blocks the others.
+        """
+        pending = [provider_id for provider_id in provider_ids if not self.is_loaded(provider_id)]
+        if len(pending) == 1:
+            self._try_build(pending[0])
+        elif pending:
+            with ThreadPoolExecutor(max_workers=len(pending)) as executor:
+                list(executor.map(self._try_build, pending))
+
+    def _try_build(self, provider_id: str) -> None:
+        try:
+            self[provider_id]
+            self._failed.discard(provider_id)
+        except Exception as e:
+            self._failed.add(provider_id)
+            logger.warning("Could not initialize %s adapter: %s", provider_id, e)
+
+    def add(self, provider_id: str) -> None:
+        """List a provider whose adapter will be constructed on first access."""
+        with self._lock:
+            if provider_id not in self._provider_ids:
+                self._provider_ids.append(provider_id)
+
+    def __setitem__(self, provider_id: str, adapter: AIEngineAdapter) -> None:
+        with self._lock:
+            if provider_id not in self._provider_ids:
+                self._provider_ids.append(provider_id)
+            self._instances[provider_id] = adapter
+
+    def __delitem__(self, provider_id: str) -> None:
+        with self._lock:
+            self._provider_ids.remove(provider_id)
+            self._instances.pop(provider_id, None)
+
+    def __contains__(self, provider_id: object) -> bool:
+        return provider_id in self._provider_ids
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._provider_ids))
+
+    def __len__(self) -> int:
+        return len(self._provider_ids)
+
+    def is_loaded(self, provider_id: str) -> bool:
+        """Whether the adapter for a provider has been constructed yet."""
+        return provider_id in self._instances
+
+    def build_failed(self, provider_id: str) -> bool:
+        """Whether the last attempt to construct a provider's adapter raised."""
+        return provider_id in self._failed
+
+
 class AIService:
     """Main AI service that manages multiple AI providers using adapter pattern."""
 
     def __init__(self):
-        """Initialize AI service with all available adapters."""
-        # Initialize all adapters
-        self.adapters = {
-            "bedrock": BedrockAdapter(),
-            "claude": ClaudeAdapter(),
-            "gemini": GeminiAdapter(),
-        }
+        """Initialize AI service; adapters are constructed lazily on first use."""
+        self.adapters = LazyAdapters(_load_adapter, self._enabled_providers())
 
         self.active_provider = None
+        self._prompt_cache = PromptCache()
+        self._disk_cache = self._open_disk_cache()
+        self._semantic_cache = EmbeddingCache()
+        self._schema_digests: "OrderedDict[str, bytes]" = OrderedDict()
+        self._schema_digest_lock = threading.Lock()
+        # Requests currently being generated, so identical concurrent requests share one call
+        self._inflight: Dict[str, "Future[Tuple[str, str]]"] = {}
+        self._inflight_lock = threading.Lock()
         self._determine_active_provider()
 
+    @staticmethod
+    def _enabled_providers() -> List[str]:
+        """Provider ids from AI_PROVIDERS_ENABLED, in fallback order (all providers if unset)."""
+        if not AI_PROVIDERS_ENABLED:
+            return list(ADAPTER_CLASSES)
+        unknown = [provider_id for provider_id in AI_PROVIDERS_ENABLED if provider_id not in ADAPTER_CLASSES]
+        if unknown:
+            logger.warning("Ignoring unknown providers in AI_PROVIDERS_ENABLED: %s", ", ".join(unknown))
+        return [provider_id for provider_id in ADAPTER_CLASSES if provider_id in AI_PROVIDERS_ENABLED]
+
+    @staticmethod
+    def _open_disk_cache() -> Optional[DiskPromptCache]:
+        """Open the persistent prompt cache tier if PROMPT_CACHE_DB is configured."""
+        if not (ENABLE_PROMPT_CACHE and PROMPT_CACHE_DB):
+            return None
+        try:
+            return DiskPromptCache(PROMPT_CACHE_DB)
+        except sqlite3.Error as e:
+            logger.warning("Persistent prompt cache disabled (%s)", PROMPT_CACHE_DB, exc_info=e)
+            return None
+
     def _determine_active_provider(self):
         """Determine which AI provider to use based on configuration and availability."""
         # First, try the configured provider
-        if AI_PROVIDER in self.adapters and self.adapters[AI_PROVIDER].is_available():
+        if self._available_adapters([AI_PROVIDER]):
             self.active_provider = AI_PROVIDER
             return
 
-        # Fallback to first available provider
-        for provider_id, adapter in self.adapters.items():
-            if adapter.is_available():
+        # Fallback to first available provider, skipping those whose SDK isn't installed;
+        # the remaining candidates are probed concurrently
+        candidates = [
+            provider_id
+            for provider_id in self.adapters
+            if provider_id != AI_PROVIDER and (provider_id not in ADAPTER_CLASSES or _sdk_installed(provider_id))
+        ]
+        available = self._available_adapters(candidates)
+        for provider_id in candidates:
+            if provider_id in available:
                 self.active_provider = provider_id
-                logger.info("Using %s (fallback from %s)", adapter.name, AI_PROVIDER)
+                logger.info("Using %s (fallback from %s)", available[provider_id].name, AI_PROVIDER)
                 return
 
         # No providers available
         self.active_provider = None
         logger.warning("No AI providers available; SQL generation disabled")
 
+    def close(self) -> None:
+        """Release the persistent prompt cache's writer thread and database connection."""
+        if self._disk_cache is not None:
+            self._disk_cache.close()
+
     def is_available(self) -> bool:
         """Check if any AI provider is available."""
         return self.active_provider is not None
@@ -78,20 +504,63 @@ class AIService:
         """Get the currently active provider ID."""
         return self.active_provider
 
+    @property
+    def active_provider(self) -> Optional[str]:
+        """ID of the provider used for SQL generation, or None."""
+        return self._active_provider
+
+    @active_provider.setter
+    def active_provider(self, provider_id: Optional[str]) -> None:
+        # Resolve the adapter and cache key prefix once per provider change instead of on every request
+        self._active_adapter = self.adapters.get(provider_id) if provider_id else None
+        self._hash_key = f"{provider_id}|{CACHE_VERSION}".encode()
+        self._active_provider = provider_id
+
     def get_active_adapter(self):
         """Get the active adapter instance."""
-        if self.active_provider:
-            return self.adapters.get(self.active_provider)
-        return None
+        return self._active_adapter
 
-    def get_available_providers(self) -> Dict[str, str]:
-        """Get list of available providers with their display names."""
+    def _available_adapters(self, provider_ids: List[str]) -> Dict[str, AIEngineAdapter]:
+        """Construct the given providers' adapters concurrently and return the usable ones.
+
+        Unknown providers and adapters that fail to construct are left out.
+        """
+        provider_ids = [provider_id for provider_id in provider_ids if provider_id in self.adapters]
+        self.adapters.load(provider_ids)
         available = {}
-        for provider_id, adapter in self.adapters.items():
-            if adapter.is_available():
-                available[provider_id] = adapter.name
+        for provider_id in provider_ids:
+            if self.adapters.is_loaded(provider_id):
+                adapter = self.adapters[provider_id]
+                if adapter.is_available():
+                    available[provider_id] = adapter
         return available
 
+    def get_available_providers(self) -> Dict[str, str]:
+        """Get selectable providers with their display names.
+
+        Providers that are configured but not built yet are included; their
+        adapter is only constructed once selected with ``set_active_provider``.
+        """
+        providers = {}
+        for provider_id, state in self._provider_states().items():
+            if state:
+                providers[provider_id] = self.adapters[provider_id].name
+            elif state is None:
+                providers[provider_id] = PROVIDER_INFO[provider_id][0]
+        return providers
+
+    def _provider_states(self) -> Dict[str, Optional[bool]]:
+        """Provider id -> True (built and usable), None (configured, not built yet) or False; builds nothing."""
+        states: Dict[str, Optional[bool]] = {}
+        for provider_id in self.adapters:
+            if self.adapters.is_loaded(provider_id):
+                states[provider_id] = self.adapters[provider_id].is_available()
+            elif not self.adapters.build_failed(provider_id) and _provider_configured(provider_id):
+                states[provider_id] = None
+            else:
+                states[provider_id] = False
+        return states
+
     def set_active_provider(self, provider_id: str) -> bool:
         """Manually set the active provider if available.
 
@@ -101,19 +570,26 @@ class AIService:
         Returns:
             bool: True if provider was set successfully, False otherwise
         """
-        if provider_id in self.adapters and self.adapters[provider_id].is_available():
+        # Providers left out of AI_PROVIDERS_ENABLED are imported on demand
+        if provider_id in ADAPTER_CLASSES:
+            self.adapters.add(provider_id)
+        if self._available_adapters([provider_id]):
             self.active_provider = provider_id
             return True
         return False
 
     def get_provider_status(self) -> Dict[str, Any]:
-        """Get status of all providers."""
-        status = {
+        """Get status of all providers.
+
+        Each provider maps to True (available), False (unavailable) or None
+        (configured but not loaded yet).
+        """
+        status: Dict[str, Any] = {
             "active": self.active_provider,
         }
 
-        for provider_id, adapter in self.adapters.items():
-            status[provider_id] = adapter.is_available()
+        for provider_id, state in self._provider_states().items():
+            status[provider_id] = state
 
         return status
 
@@ -135,30 +611,102 @@ class AIService:
         # Normalize question by removing extra whitespace and lowercasing
         normalized_question = " ".join(user_question.lower().split())
 
-        # Extract only schema structure (ignore comments/descriptions)
-        schema_lines = [
-            line.strip() for line in schema_context.splitlines() if line.strip() and not line.strip().startswith("--")
-        ]
-        schema_struct = "\n".join(schema_lines)
-
-        # Combine all cache key components
-        combined = f"{normalized_question}|{schema_struct}|{self.active_provider}|{CACHE_VERSION}"
-        return hashlib.sha256(combined.encode()).hexdigest()
+        # Provider and cache version are the hash key (set once per provider change);
+        # the schema contributes its fixed-size memoized digest, so this is O(len(question))
+        digest = hashlib.blake2b(self._schema_digest(schema_context), digest_size=16, key=self._hash_key)
+        digest.update(normalized_question.encode())
+        return digest.hexdigest()
 
-    def _build_sql_prompt(self, user_question: str, schema_context: str) -> str:
-        """Build the SQL generation prompt with performance optimization.
+    def _schema_digest(self, schema_context: str) -> bytes:
+        """Digest of the schema structure (comments and blank lines ignored), memoized.
 
-        Reuses prompt components and avoids redundant template expansion.
+        Schema context rarely changes, so the line scan and hash run once per
+        distinct schema. Entries are keyed by the string itself (str caches its
+        own hash, so repeat lookups with the same object are O(1)) and the
+        oldest is dropped beyond SCHEMA_DIGEST_CACHE_SIZE.
         """
-        return build_sql_generation_prompt(user_question, schema_context)
+        cached = self._schema_digests.get(schema_context)
+        if cached is not None:
+            return cached
+
+        stripped_lines = (line.strip() for line in schema_context.splitlines())
+        schema_struct = "\n".join(line for line in stripped_lines if line and not line.startswith("--"))
+        # blake2b is faster than sha256 and a 128-bit digest is plenty for a cache key
+        schema_digest = hashlib.blake2b(schema_struct.encode(), digest_size=16).digest()
+
+        with self._schema_digest_lock:
+            self._schema_digests[schema_context] = schema_digest
+            while len(self._schema_digests) > SCHEMA_DIGEST_CACHE_SIZE:
+                self._schema_digests.popitem(last=False)
+        return schema_digest
+
+    def _semantic_schema_key(self, schema_context: str) -> str:
+        """Key semantic cache entries by schema and provider so matches never cross them."""
+        return hashlib.blake2b(self._schema_digest(schema_context), digest_size=16, key=self._hash_key).hexdigest()
+
+    def _embed_questions(self, questions: List[str]) -> Optional[List[Any]]:
+        """Embed questions for the semantic cache.
+
+        Uses a local ONNX model through fastembed when it is installed (no
+        network round-trip), otherwise Gemini embeddings if Gemini is
+        configured. Returns None when neither is available or embedding fails.
+        """
+        try:
+            local_embedder = _get_local_embedder()
+            if local_embedder is not None:
+                return list(local_embedder.embed(questions))
+        except Exception as e:
+            logger.warning("Local embedding failed: %s", e)
+            return None
+
+        # A Gemini adapter that fails to build or embed skips the semantic tier rather than the request
+        if "gemini" not in self.adapters or self.adapters.build_failed("gemini"):
+            return None
+        self.adapters.load(["gemini"])
+        if not self.adapters.is_loaded("gemini"):
+            return None
+        embedder = self.adapters["gemini"]
+        if not embedder.is_available():
+            return None
+        try:
+            return embedder.embed_texts(questions)
+        except Exception as e:
+            logger.warning("Gemini embedding failed: %s", e)
+            return None
+
+    def warm_semantic_cache(self, examples: List[Tuple[str, str, str]]) -> int:
+        """Pre-populate the semantic cache with known-good answers.
 
-    def generate_sql(self, user_question: str, schema_context: str) -> Tuple[str, str, str]:
+        Args:
+            examples: (user_question, schema_context, sql_query) triples
+
+        Returns:
+            int: Number of entries added
+        """
+        if not examples:
+            return 0
+        embeddings = self._embed_questions([question for question, _, _ in examples])
+        if not embeddings:
+            return 0
+        for (_, schema_context, sql_query), embedding in zip(examples, embeddings):
+            self._semantic_cache.add(embedding, self._semantic_schema_key(schema_context), sql_query)
+        return len(embeddings)
+
+    # The prompt needs no instance state: bind the builder directly so each call
+    # is one function call over its precomputed module-level segments
+    _build_sql_prompt = staticmethod(build_sql_generation_prompt)
+
+    def generate_sql(
+        self, user_question: str, schema_context: str, on_token: Optional[TokenCallback] = None
+    ) -> Tuple[str, str, str]:
         """
         Generate SQL query using available AI provider.
 
         Args:
             user_question: Natural language question
             schema_context: Database schema context
+            on_token: Optional callback receiving response text as it streams
+                in (not called for cached answers)
 
         Returns:
             Tuple[str, str, str]: (sql_query, error_message, provider_used)
@@ -183,75 +731,148 @@ No AI providers are configured or available. This could be due to:
             return "", error_msg, "none"
 
         cache_key: Optional[str] = None
-        cache_store: Optional[Dict[str, Tuple[str, str]]] = None
-
         if ENABLE_PROMPT_CACHE:
             cache_key = self._create_prompt_hash(user_question, schema_context)
-            try:
-                # Use TTL-aware cache store
-                cache_store = st.session_state.setdefault("_ai_prompt_cache", {})
-                cache_timestamps = st.session_state.setdefault("_ai_prompt_cache_timestamps", {})
-                current_time = int(time.time())
-
-                # Clear expired cache entries
-                expired_keys = [k for k, t in cache_timestamps.items() if current_time - t > PROMPT_CACHE_TTL]
-                for k in expired_keys:
-                    cache_store.pop(k, None)
-                    cache_timestamps.pop(k, None)
-
-                # Check cache with validation
-                cached_payload = cache_store.get(cache_key)
-                if isinstance(cached_payload, tuple) and len(cached_payload) == 2:
-                    cached_sql, cached_error = cached_payload
-                    if cached_sql and not cached_error:
-                        # Update access time to extend TTL
-                        cache_timestamps[cache_key] = current_time
-                        return cached_sql, cached_error, f"{self.active_provider} (cached)"
-            except RuntimeError:
-                cache_store = None
-
-        # Build prompt after cache lookup to prevent unnecessary work
-        prompt = self._build_sql_prompt(user_question, schema_context)
+            cached_sql = self._prompt_cache.get(cache_key)
+            if not cached_sql and self._disk_cache is not None:
+                cached_sql = self._disk_cache.get(cache_key)
+                if cached_sql:
+                    self._prompt_cache.set(cache_key, cached_sql)
+            if cached_sql:
+                return cached_sql, "", f"{self.active_provider} (cached)"
+
+        # Semantic tier: a semantically equivalent question answered earlier
+        question_embedding = None
+        if ENABLE_SEMANTIC_CACHE:
+            embeddings = self._embed_questions([user_question])
+            if embeddings:
+                question_embedding = embeddings[0]
+                cached_sql = self._semantic_cache.lookup(question_embedding, self._semantic_schema_key(schema_context))
+                if cached_sql:
+                    if cache_key:
+                        self._prompt_cache.set(cache_key, cached_sql)
+                    return cached_sql, "", f"{self.active_provider} (semantic-cached)"
 
         # Get active adapter
         adapter = self.get_active_adapter()
         if not adapter:
             return "", "No AI adapter available", "none"
 
-        # Generate SQL using adapter
-        sql_query, error_msg = adapter.generate_sql(prompt)
+        # Single-flight: if the same request is already being generated (e.g. by
+        # another session), wait for that result instead of calling the provider again
+        inflight_key = cache_key or self._create_prompt_hash(user_question, schema_context)
+        with self._inflight_lock:
+            pending = self._inflight.get(inflight_key)
+            if pending is None:
+                future: "Future[Tuple[str, str]]" = Future()
+                self._inflight[inflight_key] = future
+
+        if pending is not None:
+            sql_query, error_msg = pending.result()
+            return sql_query, error_msg, self.active_provider or "none"
+
+        try:
+            # Build prompt after cache lookup to prevent unnecessary work
+            prompt = self._build_sql_prompt(user_question, schema_context)
+
+            # Generate SQL using adapter
+            sql_query, error_msg = adapter.generate_sql(prompt, on_token)
+            future.set_result((sql_query, error_msg))
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(inflight_key, None)
 
         # Cache the result if successful and caching is enabled
-        if cache_key and cache_store is not None and sql_query and not error_msg:
-            try:
-                # Validate SQL before caching
-                adapter = self.get_active_adapter()
-                if adapter:
-                    is_valid, validation_error = adapter.validate_response(sql_query)
-                    if is_valid:
-                        # Store result and timestamp
-                        cache_store[cache_key] = (sql_query, error_msg)
-                        st.session_state["_ai_prompt_cache_timestamps"][cache_key] = int(time.time())
-                        # Prune cache if too large (keep last 1000 entries)
-                        if len(cache_store) > 1000:
-                            oldest_key = min(
-                                st.session_state["_ai_prompt_cache_timestamps"].items(), key=lambda x: x[1]
-                            )[0]
-                            cache_store.pop(oldest_key, None)
-                            st.session_state["_ai_prompt_cache_timestamps"].pop(oldest_key, None)
-                    else:
-                        logger.warning("Not caching invalid SQL response: %s", validation_error)
-            except Exception as e:
-                logger.warning("Error while caching SQL response: %s", str(e))
-
-        return sql_query, error_msg, self.active_provider
-
-
-# Global AI service instance (cached)
-@st.cache_resource
+        if (cache_key or question_embedding is not None) and sql_query and not error_msg:
+            # Validate SQL before caching
+            is_valid, validation_error = adapter.validate_response(sql_query)
+            if is_valid:
+                if cache_key:
+                    self._prompt_cache.set(cache_key, sql_query)
+                    if self._disk_cache is not None:
+                        self._disk_cache.set(cache_key, sql_query)
+                if question_embedding is not None:
+                    self._semantic_cache.add(question_embedding, self._semantic_schema_key(schema_context), sql_query)
+            else:
+                logger.warning("Not caching invalid SQL response: %s", validation_error)
+
+        return sql_query, error_msg, self.active_provider or "none"
+
+    async def generate_sql_batch(self, questions: List[Tuple[str, str]]) -> List[Tuple[str, str, str]]:
+        """
+        Generate SQL for many questions concurrently.
+
+        Requests are dispatched to the active adapter together, so the batch
+        completes in roughly the time of the slowest request rather than the
+        sum of all of them. Results bypass the prompt cache.
+
+        When the active adapter supports a provider batch API (Gemini) and the
+        batch is larger than BATCH_THRESHOLD, or AI_BATCH_MODE is set, the
+        prompts are submitted as one server-side batch job instead. Those jobs
+        are cheaper but may take minutes to hours.
+
+        Args:
+            questions: (user_question, schema_context) pairs
+
+        Returns:
+            List[Tuple[str, str, str]]: (sql_query, error_message, provider_used)
+            for each question, in input order
+        """
+        adapter = self.get_active_adapter()
+        if adapter is None:
+            return [("", "No AI adapter available", "none") for _ in questions]
+
+        provider = self.active_provider or "none"
+        prompts = [self._build_sql_prompt(question, schema) for question, schema in questions]
+        if hasattr(adapter, "generate_sql_batch") and (AI_BATCH_MODE or len(prompts) > BATCH_THRESHOLD):
+            results = await asyncio.to_thread(adapter.generate_sql_batch, prompts)
+        else:
+            results = await asyncio.gather(*(adapter.generate_sql_async(prompt) for prompt in prompts))
+        return [(sql_query, error_msg, provider) for sql_query, error_msg in results]
+
+
+# Global AI service instance (cached): (cache_version, service)
+_AI_SERVICE: Optional[Tuple[int, AIService]] = None
+_AI_SERVICE_LOCK = threading.Lock()
+
+
 def get_ai_service(cache_version: int = CACHE_VERSION) -> AIService:
-    """Get or create global AI service instance (cached)."""
-    return AIService()
+    """Get or create global AI service instance (cached).
+
+    A module-level singleton rather than st.cache_resource: this is called
+    several times per rerun, and the service holds no per-session state, so
+    there is no need to hash the arguments on every call. A different
+    ``cache_version`` replaces the instance.
+    """
+    global _AI_SERVICE
+    current = _AI_SERVICE
+    if current is not None and current[0] == cache_version:
+        return current[1]
+    with _AI_SERVICE_LOCK:
+        replaced = None
+        if _AI_SERVICE is None or _AI_SERVICE[0] != cache_version:
+            replaced = _AI_SERVICE
+            _AI_SERVICE = (cache_version, AIService())
+        service = _AI_SERVICE[1]
+    if replaced is not None:
+        replaced[1].close()
+    return service
+
+
+def _clear_ai_service() -> None:
+    """Drop the global AI service so the next get_ai_service() builds a new one."""
+    global _AI_SERVICE
+    with _AI_SERVICE_LOCK:
+        replaced, _AI_SERVICE = _AI_SERVICE, None
+    if replaced is not None:
+        replaced[1].close()
+
+
+# Same invalidation API as st.cache_resource-decorated functions
+get_ai_service.clear = _clear_ai_service  # type: ignore[attr-defined]
 
 
 # Convenience functions for backward compatibility
@@ -264,8 +885,17 @@ def initialize_ai_client() -> Tuple[Optional[AIService], str]:
     return None, "none"
 
 
-def generate_sql_with_ai(user_question: str, schema_context: str) -> Tuple[str, str]:
+def generate_sql_with_ai(
+    user_question: str, schema_context: str, on_token: Optional[TokenCallback] = None
+) -> Tuple[str, str]:
     """Generate SQL with AI - backward compatibility."""
     service = get_ai_service()
-    sql_query, error_msg, provider = service.generate_sql(user_question, schema_context)
+    sql_query, error_msg, provider = service.generate_sql(user_question, schema_context, on_token)
     return sql_query, error_msg
+
+
+def generate_sql_batch_with_ai(questions: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    """Generate SQL for several (question, schema) pairs concurrently from synchronous code."""
+    service = get_ai_service()
+    results = asyncio.run(service.generate_sql_batch(questions))
+    return [(sql_query, error_msg) for sql_query, error_msg, _ in results]
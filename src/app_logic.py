@@ -24,19 +24,16 @@ def initialize_app_data():
 
     # Check if we need to initialize data (avoid reinitializing on every rerun)
     if "app_initialized" not in st.session_state or not st.session_state.app_initialized:
-        # Show spinner only if we're actually loading data
+        # The cached loaders show their own spinner, and only on a cache miss
         if "parquet_files" not in st.session_state:
-            with st.spinner("🔄 Loading data files..."):
-                st.session_state.parquet_files = load_parquet_files()
+            st.session_state.parquet_files = load_parquet_files()
 
         if "schema_context" not in st.session_state:
-            with st.spinner("🔄 Building schema context..."):
-                st.session_state.schema_context = load_schema_context(st.session_state.parquet_files)
+            st.session_state.schema_context = load_schema_context(st.session_state.parquet_files)
 
         if "ai_service" not in st.session_state:
-            with st.spinner("🔄 Initializing AI services..."):
-                st.session_state.ai_service = load_ai_service()
-                st.session_state.ai_available = st.session_state.ai_service.is_available()
+            st.session_state.ai_service = load_ai_service()
+            st.session_state.ai_available = st.session_state.ai_service.is_available()
 
         # Mark as initialized only after all components are loaded
         st.session_state.app_initialized = True
@@ -3,19 +3,27 @@
 
 import logging
 import os
-import subprocess
-import sys
+import re
+import threading
 from contextlib import closing
+from itertools import groupby
+from operator import itemgetter
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 
-import duckdb
-import pandas as pd
 import streamlit as st
 from dotenv import load_dotenv
 
 from .ai_service import generate_sql_with_ai, get_ai_service
 from .data_dictionary import generate_enhanced_schema_context
+from .utils import get_analyst_questions  # noqa: F401 - re-exported for app.py
+from .utils import FileFingerprint, fingerprint_files, group_parquet_tables
+
+# duckdb and pandas are imported where they are used, so pages that never touch
+# the data (e.g. the login screen) do not pay for loading them
+if TYPE_CHECKING:
+    import duckdb
+    import pandas as pd
 
 # Optional modular imports (best-effort; keep legacy behavior if missing)
 try:  # pragma: no cover - optional during migration
@@ -41,6 +49,25 @@ DATASET_ROOT = os.getenv("DATASET_ROOT", str(PROCESSED_DATA_DIR))
 DATASET_PLUGIN = os.getenv("DATASET_PLUGIN", "")
 ONTOLOGY_PLUGIN = os.getenv("ONTOLOGY_PLUGIN", "")
 
+_CREATE_TABLE_RE = re.compile(r"CREATE\s+TABLE\s+\"?\w+\"?\s*\(", re.IGNORECASE)
+
+# Set once local data has been verified (or synced) in this process
+_data_verified = False
+_data_sync_lock = threading.Lock()
+
+
+def _list_parquet_files() -> List[Path]:
+    """Return the sorted parquet files in PROCESSED_DATA_DIR, or [] if it is missing."""
+    try:
+        with os.scandir(PROCESSED_DATA_DIR) as entries:
+            return sorted(
+                Path(entry.path)
+                for entry in entries
+                if entry.name.endswith(".parquet") and entry.is_file(follow_symlinks=False)
+            )
+    except FileNotFoundError:
+        return []
+
 
 @st.cache_data(ttl=CACHE_TTL)
 def scan_parquet_files() -> List[str]:
@@ -55,40 +82,43 @@ def scan_parquet_files() -> List[str]:
     3. File validation
     4. Size and modification time tracking
     """
+    import duckdb
+
     # Check if data sync is needed
     sync_data_if_needed()
 
-    if not PROCESSED_DATA_DIR.exists():
-        return []
-
     # Track file metadata for cache invalidation
     file_metadata = {}
-    valid_files = []
+    candidates = []
 
-    for path in sorted(PROCESSED_DATA_DIR.glob("*.parquet")):
+    for path in _list_parquet_files():
         try:
             # Get file stats
             stats = path.stat()
             if stats.st_size == 0:
                 logger.warning("Skipping empty file: %s", path)
                 continue
-
-            # Quick validation of Parquet format
-            try:
-                with closing(duckdb.connect()) as conn:
-                    test_query = f"SELECT * FROM '{path}' LIMIT 1"
-                    conn.execute(test_query)
-            except Exception as e:
-                logger.warning("Skipping invalid parquet file %s: %s", path, e)
-                continue
-
-            # Track metadata for cache invalidation
+            candidates.append(str(path))
             file_metadata[str(path)] = {"size": stats.st_size, "mtime": stats.st_mtime}
-            valid_files.append(str(path))
-
         except Exception as e:
             logger.warning("Error processing file %s: %s", path, e)
-            continue
+
+    # Quick validation of Parquet format: one footer-only query for every file,
+    # falling back to file-by-file only to pinpoint a bad one
+    valid_files = candidates
+    if candidates:
+        with closing(duckdb.connect()) as conn:
+            try:
+                conn.execute("SELECT file_name FROM parquet_file_metadata(?)", [candidates]).fetchall()
+            except Exception:
+                valid_files = []
+                for file_path in candidates:
+                    try:
+                        conn.execute("SELECT num_rows FROM parquet_file_metadata(?)", [file_path]).fetchall()
+                        valid_files.append(file_path)
+                    except Exception as e:
+                        logger.warning("Skipping invalid parquet file %s: %s", file_path, e)
+                        file_metadata.pop(file_path, None)
 
     # Store metadata in session state for change detection
     st.session_state["parquet_file_metadata"] = file_metadata
@@ -99,24 +129,40 @@ def scan_parquet_files() -> List[str]:
 def sync_data_if_needed(force: bool = False) -> bool:
     """Check if data sync from R2 is needed and perform if necessary.
 
+    Local data is verified once per process; later calls return immediately
+    unless ``force`` is set. Concurrent callers wait for the check in progress.
+
     Args:
         force: If True, force sync even if data exists
 
     Returns:
         bool: True if data is available, False if sync failed
     """
+    global _data_verified
+    if _data_verified and not force:
+        return True
+    with _data_sync_lock:
+        if _data_verified and not force:
+            return True
+        _data_verified = _sync_data(force)
+        return _data_verified
+
+
+def _sync_data(force: bool) -> bool:
+    import duckdb
+
     try:
         # Check if processed directory exists and has valid data
-        if not force and PROCESSED_DATA_DIR.exists():
-            parquet_files = sorted(PROCESSED_DATA_DIR.glob("*.parquet"))
+        if not force:
+            parquet_files = _list_parquet_files()
             if parquet_files:
-                # Verify files are not empty/corrupted
+                # Verify files are readable and not empty (row count comes from the footer)
                 try:
                     with closing(duckdb.connect()) as conn:
-                        test_query = f"SELECT COUNT(*) FROM '{parquet_files[0]}'"
-                        row = conn.execute(test_query).fetchone()
+                        test_query = "SELECT SUM(num_rows) FROM parquet_file_metadata(?)"
+                        row = conn.execute(test_query, [str(parquet_files[0])]).fetchone()
 
-                    if row and row[0] > 0:
+                    if row and row[0]:
                         logger.info("Found %d valid parquet file(s) with data", len(parquet_files))
                         return True
                     logger.warning("Existing parquet files appear empty; rerunning sync")
@@ -127,30 +173,26 @@ def sync_data_if_needed(force: bool = False) -> bool:
         sync_reason = "Force sync requested" if force else "No valid local data found"
         logger.info("%s. Attempting R2 sync…", sync_reason)
 
-        sync_args = [sys.executable, "scripts/sync_data.py"]
-        if force:
-            sync_args.append("--force")
+        # Imported here so boto3 only loads when a sync actually runs
+        from .sync import sync
 
-        sync_result = subprocess.run(sync_args, capture_output=True, text=True)
-
-        if sync_result.returncode == 0:
+        if sync(force=force):
             logger.info("R2 sync completed successfully")
             return True
-        else:
-            logger.error("R2 sync failed: %s", sync_result.stderr.strip())
-            if sync_result.stdout:
-                logger.debug("Sync output: %s", sync_result.stdout.strip())
-            return False
+        logger.error("R2 sync failed")
+        return False
 
     except Exception as e:
         logger.error("Error during data sync", exc_info=e)
         return False
 
 
-@st.cache_data(ttl=CACHE_TTL)
 def get_table_schemas(parquet_files: List[str]) -> str:
     """Generate enhanced CREATE TABLE statements with rich metadata.
 
+    The result is cached on each file's (path, mtime, size), so it is rebuilt
+    only when a file actually changes rather than on a timer.
+
     Features:
     - Smart caching with metadata validation
     - Graceful fallback to basic schema
@@ -163,6 +205,13 @@ def get_table_schemas(parquet_files: List[str]) -> str:
     if not parquet_files:
         return ""
 
+    return _build_table_schemas(fingerprint_files(parquet_files))
+
+
+@st.cache_data(max_entries=8, show_spinner="🔄 Building schema context...")
+def _build_table_schemas(fingerprint: FileFingerprint) -> str:
+    parquet_files = [file_path for file_path, _, _ in fingerprint]
+
     # Try modular builder first
     try:
         if build_schema_context_from_parquet is not None:
@@ -196,57 +245,52 @@ def get_table_schemas(parquet_files: List[str]) -> str:
 def validate_schema_context(schema: str) -> bool:
     """Validate generated schema context.
 
+    The context is read by the model, not executed, so this checks its shape
+    (at least one ``CREATE TABLE name (`` block) rather than running it
+    through DuckDB.
+
     Checks:
     - Not empty
     - Contains CREATE TABLE statements
-    - Valid SQL syntax
-    - References existing tables
     """
     if not schema or not schema.strip():
         return False
 
-    try:
-        # Check for CREATE TABLE statements
-        if "CREATE TABLE" not in schema.upper():
-            return False
-
-        # Validate SQL syntax
-        with closing(duckdb.connect()) as conn:
-            # Try parsing each statement
-            for statement in schema.split(";"):
-                if statement.strip():
-                    conn.execute(statement + ";")
-        return True
-
-    except Exception as e:
-        logger.warning("Schema validation failed: %s", e)
+    if not _CREATE_TABLE_RE.search(schema):
+        logger.warning("Schema validation failed: no CREATE TABLE statement found")
         return False
+    return True
 
 
 def get_basic_table_schemas(parquet_files: List[str]) -> str:
     """Fallback basic schema generation with error handling."""
+    import duckdb
+
     if not parquet_files:
         return ""
 
-    create_statements = []
+    tables = group_parquet_tables(parquet_files)
+
+    # One round trip for every table; DESCRIBE only binds the scan, so just the footers are read
+    describe_queries = [
+        f"SELECT {index} AS table_index, row_number() OVER () AS position, column_name, column_type "
+        "FROM (DESCRIBE SELECT * FROM read_parquet(?, union_by_name=true))"
+        for index in range(len(tables))
+    ]
+    query = " UNION ALL ".join(describe_queries) + " ORDER BY table_index, position"
+    table_names = list(tables)
+    params = [[Path(file_path).as_posix() for file_path in files] for files in tables.values()]
 
     try:
         with closing(duckdb.connect()) as conn:
-            for file_path in parquet_files:
-                path = Path(file_path)
-                table_name = path.stem
-                query = f"DESCRIBE SELECT * FROM '{path.as_posix()}' LIMIT 1"
-                schema_df = conn.execute(query).fetchdf()
-
-                columns = []
-                for _, row in schema_df.iterrows():
-                    column_name = row["column_name"]
-                    column_type = row["column_type"]
-                    columns.append(f"    {column_name} {column_type}")
-
-                create_statement = f"CREATE TABLE {table_name} (\n" + ",\n".join(columns) + "\n);"
-                create_statements.append(create_statement)
-
+            rows = conn.execute(query, params).fetchall()
+
+        create_statements = [
+            f"CREATE TABLE {table_names[index]} (\n"
+            + ",\n".join(f"    {column_name} {column_type}" for _, _, column_name, column_type in columns)
+            + "\n);"
+            for index, columns in groupby(rows, key=itemgetter(0))
+        ]
         return "\n\n".join(create_statements)
 
     except Exception as exc:
@@ -268,60 +312,64 @@ def generate_sql_with_bedrock(user_question: str, schema_context: str, bedrock_c
     return generate_sql_with_ai(user_question, schema_context)
 
 
-@st.cache_resource
-def get_duckdb_pool():
-    """Create or get cached DuckDB connection pool."""
-    if "duckdb_pool" not in st.session_state:
-        st.session_state["duckdb_pool"] = []
-    return st.session_state["duckdb_pool"]
+def _quote_identifier(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
 
 
-def get_duckdb_connection():
-    """Get a DuckDB connection from the pool or create a new one."""
-    pool = get_duckdb_pool()
+def _quote_literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
 
-    # Try to get existing connection
-    while pool:
-        conn = pool.pop()
-        try:
-            # Test if connection is still good
-            conn.execute("SELECT 1")
-            return conn
-        except Exception:
-            try:
-                conn.close()
-            except Exception:
-                pass
 
-    # Create new connection
-    return duckdb.connect()
+@st.cache_resource(max_entries=4)
+def get_duckdb_connection(fingerprint: FileFingerprint) -> "duckdb.DuckDBPyConnection":
+    """Shared in-memory DuckDB connection with one view per table.
 
+    Keyed on the files' (path, mtime, size) fingerprint, so a file replaced in
+    place gets a fresh connection rather than stale cached parquet metadata.
 
-def return_duckdb_connection(conn):
-    """Return a connection to the pool."""
-    try:
-        pool = get_duckdb_pool()
-        if len(pool) < 5:  # Maximum pool size
-            pool.append(conn)
-        else:
-            conn.close()
-    except Exception:
-        try:
-            conn.close()
-        except Exception:
-            pass
+    Each parquet file is its own table; with COMBINE_PARTITIONED_TABLES=true,
+    partitioned files that share a base name (see group_parquet_tables) are
+    scanned by a single view.
 
+    Views read the parquet files lazily, so each query only scans the columns
+    and row groups it needs and nothing is materialized in memory. The
+    connection is built once per distinct file set and shared across sessions;
+    callers run queries on their own cursor().
+    """
+    import duckdb
 
-def execute_sql_query(sql_query: str, parquet_files: List[str]) -> pd.DataFrame:
-    """Execute SQL query using DuckDB with connection pooling and optimization.
+    conn = duckdb.connect(":memory:")
+    # Keep parquet footers in memory between queries; older DuckDB releases only have the object cache
+    try:
+        conn.execute("SET parquet_metadata_cache=true")
+    except duckdb.Error:
+        conn.execute("SET enable_object_cache=true")
+    for table_name, files in group_parquet_tables([file_path for file_path, _, _ in fingerprint]).items():
+        # CREATE VIEW cannot take prepared parameters, so the name and paths are quoted instead
+        paths = ", ".join(_quote_literal(Path(file_path).as_posix()) for file_path in files)
+        conn.execute(
+            f"""
+            CREATE OR REPLACE VIEW {_quote_identifier(table_name)} AS
+            SELECT * FROM read_parquet(
+                [{paths}],
+                binary_as_string=true,
+                union_by_name=true
+            )
+        """
+        )
+    return conn
+
+
+def execute_sql_query(sql_query: str, parquet_files: List[str]) -> "pd.DataFrame":
+    """Execute SQL query using DuckDB over views of the parquet files.
 
     Features:
-    - Connection pooling for better resource usage
-    - Query parameter validation and sanitization
-    - Automatic view registration with change detection
+    - One cached connection (and view registration) per file set
+    - A cursor per query, so concurrent sessions do not share query state
     - Detailed error reporting with context
-    - Query timeout protection
     """
+    import pandas as pd
+
     if not sql_query or not sql_query.strip():
         return pd.DataFrame()
 
@@ -329,54 +377,10 @@ def execute_sql_query(sql_query: str, parquet_files: List[str]) -> pd.DataFrame:
         logger.warning("SQL execution requested without any parquet files loaded")
         return pd.DataFrame()
 
-    # Get connection from pool
-    conn = None
     try:
-        conn = get_duckdb_connection()
-
-        # Track registered views for change detection
-        current_views = set()
-        if "registered_views" not in st.session_state:
-            st.session_state["registered_views"] = set()
-
-        # Register files as views only if needed
-        for file_path in parquet_files:
-            path = Path(file_path)
-            table_name = path.stem
-            view_key = f"{table_name}:{str(path)}"
-
-            if view_key not in st.session_state["registered_views"]:
-                # Register view with explicit schema to optimize subsequent queries
-                conn.execute(
-                    f"""
-                    CREATE OR REPLACE VIEW {table_name} AS
-                    SELECT * FROM read_parquet(
-                        '{path.as_posix()}',
-                        binary_as_string=true
-                    )
-                """
-                )
-                st.session_state["registered_views"].add(view_key)
-            current_views.add(view_key)
-
-        # Remove stale views
-        stale_views = st.session_state["registered_views"] - current_views
-        for view_key in stale_views:
-            table_name = view_key.split(":")[0]
-            conn.execute(f"DROP VIEW IF EXISTS {table_name}")
-        st.session_state["registered_views"] = current_views
-
-        # Execute query with timeout protection
-        logger.debug("Executing SQL query: %s", sql_query)
-        conn.execute("SET enable_progress_bar=true")
-        conn.execute("PRAGMA enable_profiling")
-        result = conn.execute(sql_query).fetchdf()
-
-        # Return connection to pool
-        return_duckdb_connection(conn)
-        conn = None
-
-        return result
+        with closing(get_duckdb_connection(fingerprint_files(parquet_files)).cursor()) as cursor:
+            logger.debug("Executing SQL query: %s", sql_query)
+            return cursor.execute(sql_query).fetchdf()
 
     except Exception as exc:
         error_context = {
@@ -388,29 +392,6 @@ def execute_sql_query(sql_query: str, parquet_files: List[str]) -> pd.DataFrame:
         logger.error("SQL execution failed: %s", error_context, exc_info=exc)
         return pd.DataFrame()
 
-    finally:
-        if conn:
-            try:
-                return_duckdb_connection(conn)
-            except Exception:
-                pass
-
-
-def get_analyst_questions() -> Dict[str, str]:
-    """Return sophisticated analyst questions leveraging loan performance domain expertise."""
-    return {
-        "🎯 Portfolio Health Check": "Show me our current portfolio composition by credit risk tiers (Super Prime 740+, Prime 680-739, Near Prime 620-679, Subprime <620) with current UPB and delinquency rates",
-        "🌎 Geographic Risk Assessment": "Which top 10 states have the highest loan concentrations and how do their current delinquency rates compare to the national average?",
-        "📈 Vintage Performance Analysis": "Compare loan performance between 2020-2021 refi boom vintages vs 2022+ rising rate vintages - show loan counts, average rates, and current performance",
-        "⚠️ High-Risk Concentration": "Identify loans with combined high-risk factors: OLTV >90%, DTI >36%, and credit scores <680 - show geographic distribution and current status",
-        "💰 Jumbo Loan Intelligence": "Analyze loans above $500K - show credit profile distribution, geographic concentration, and performance compared to conforming loans",
-        "🏠 Product Mix Evolution": "Compare purchase vs refinance vs cash-out refinance loans originated in the last 24 months - show volume trends and borrower risk profiles",
-        "📊 Market Share by Channel": "Show origination volume and average loan characteristics by channel (Retail, Correspondent, Broker) for top 5 volume states",
-        "🔍 Credit Migration Analysis": "For loans aged 24-48 months (2020-2021 vintage), show how many have migrated from current to 30+ day delinquent status by original credit score",
-        "🌟 Super Prime Performance": "Analyze our Super Prime segment (740+ credit scores) - show portfolio share, average UPB, geographic distribution, and performance metrics",
-        "🎲 Rate Sensitivity Analysis": "Compare current portfolio performance between ultra-low rate loans (2-4%) vs higher rate loans (5%+) - show delinquency rates and paydown behavior",
-    }
-
 
 def get_ai_service_status() -> Dict[str, Any]:
     """Get AI service status for UI display."""
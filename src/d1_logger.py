@@ -5,6 +5,7 @@ Lightweight logging service for user activity and queries.
 """
 
 import os
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Any, Dict, List, Optional
 
 import requests  # type: ignore[import-untyped]
@@ -21,6 +22,8 @@ class D1Logger:
         self.database_id = os.getenv("CLOUDFLARE_D1_DATABASE_ID")
         self.api_token = os.getenv("CLOUDFLARE_API_TOKEN")
         self.enabled = bool(self.account_id and self.database_id and self.api_token)
+        # Activity logging is write-only, so it runs off the Streamlit script thread
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="d1-logger") if self.enabled else None
 
     def is_enabled(self) -> bool:
         """Check if D1 logging is enabled."""
@@ -51,8 +54,14 @@ class D1Logger:
             # Silent fail
             return None
 
+    def _submit_query(self, sql: str, params: Optional[List[Any]] = None) -> Optional[Future]:
+        """Execute a D1 write in the background without waiting for the response."""
+        if not self.enabled:
+            return None
+        return self._executor.submit(self._execute_query, sql, params)
+
     def log_user_login(self, user_id: str, email: str, user_agent: str = None):
-        """Log user login event."""
+        """Log user login event (in the background)."""
         if not self.enabled:
             return
 
@@ -61,12 +70,12 @@ class D1Logger:
         VALUES (?, ?, ?)
         """
 
-        self._execute_query(sql, [user_id, email, user_agent or ""])
+        self._submit_query(sql, [user_id, email, user_agent or ""])
 
     def log_user_query(
         self, user_id: str, email: str, question: str, sql_query: str, ai_provider: str, execution_time: float
     ):
-        """Log user query event."""
+        """Log user query event (in the background)."""
         if not self.enabled:
             return
 
@@ -75,7 +84,7 @@ class D1Logger:
         VALUES (?, ?, ?, ?, ?, ?)
         """
 
-        self._execute_query(sql, [user_id, email, question, sql_query, ai_provider, execution_time])
+        self._submit_query(sql, [user_id, email, question, sql_query, ai_provider, execution_time])
 
     def get_user_stats(self, user_id: str) -> Dict[str, Any]:
         """Get basic user statistics."""
@@ -5,11 +5,11 @@ Provides structured loan performance ontology optimized for UI and AI model cont
 Comprehensive coverage of all 110 columns with ACTUAL field names from data.
 """
 
-import os
+import threading
 from dataclasses import dataclass
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
-import duckdb
+from .utils import fingerprint_files, group_parquet_tables
 
 # =============================================================================
 # FIELD METADATA STRUCTURE
@@ -871,6 +871,33 @@ PORTFOLIO_CONTEXT = {
 }
 
 
+# Column (name, type) lists per parquet file, keyed on (path, mtime_ns, size). Parquet
+# files are written once, so an unchanged stat means the footer need not be re-read
+_FILE_COLUMNS_CACHE: Dict[Tuple[str, Optional[int], Optional[int]], List[Tuple[str, str]]] = {}
+_FILE_COLUMNS_LOCK = threading.Lock()
+
+
+def get_parquet_columns(parquet_files: List[str]) -> List[List[Tuple[str, str]]]:
+    """Return each file's (column_name, column_type) pairs, describing only new or changed files."""
+    keys = fingerprint_files(parquet_files)
+    with _FILE_COLUMNS_LOCK:
+        missing = [key for key in keys if key not in _FILE_COLUMNS_CACHE]
+
+    if missing:
+        import duckdb
+
+        with duckdb.connect() as conn:
+            described = {
+                key: conn.execute("DESCRIBE SELECT * FROM read_parquet(?)", [key[0]]).fetchall() for key in missing
+            }
+        with _FILE_COLUMNS_LOCK:
+            for key, rows in described.items():
+                _FILE_COLUMNS_CACHE[key] = [(row[0], row[1]) for row in rows]
+
+    with _FILE_COLUMNS_LOCK:
+        return [_FILE_COLUMNS_CACHE[key] for key in keys]
+
+
 def generate_enhanced_schema_context(parquet_files):
     """Generate clean, ontological schema context optimized for AI and UI consumption."""
 
@@ -878,7 +905,7 @@ def generate_enhanced_schema_context(parquet_files):
         return "-- No data files available"
 
     try:
-        conn = duckdb.connect()
+        file_columns = dict(zip(parquet_files, get_parquet_columns(parquet_files)))
 
         # Build comprehensive schema with ontological organization
         schema_context = f"""
@@ -899,12 +926,13 @@ def generate_enhanced_schema_context(parquet_files):
 """
 
         # Generate table schema with ontological grouping
-        for file_path in parquet_files:
-            table_name = os.path.splitext(os.path.basename(file_path))[0]
-
-            # Get actual schema from file
-            query = f"DESCRIBE SELECT * FROM '{file_path}' LIMIT 1"
-            schema_df = conn.execute(query).fetchdf()
+        for table_name, files in group_parquet_tables(parquet_files).items():
+            # Partitioned tables expose the union of their files' columns, in first-seen order
+            merged: Dict[str, str] = {}
+            for file_path in files:
+                for column_name, column_type in file_columns[file_path]:
+                    merged.setdefault(column_name, column_type)
+            columns = list(merged.items())
 
             schema_context += f"""
 -- ===================================================================
@@ -920,10 +948,7 @@ CREATE TABLE {table_name} (
 
             for domain_name, domain_info in LOAN_ONTOLOGY.items():
                 domain_columns = []
-                for _, row in schema_df.iterrows():
-                    column_name = row["column_name"]
-                    column_type = row["column_type"]
-
+                for column_name, column_type in columns:
                     if column_name in domain_info["fields"]:
                         field_meta = domain_info["fields"][column_name]
                         comment = f"-- {field_meta.description} | {field_meta.domain}"
@@ -937,10 +962,7 @@ CREATE TABLE {table_name} (
                     organized_columns.append("")
 
             # Add any unmapped columns
-            for _, row in schema_df.iterrows():
-                column_name = row["column_name"]
-                column_type = row["column_type"]
-
+            for column_name, column_type in columns:
                 # Check if column exists in any domain
                 found = False
                 for domain_info in LOAN_ONTOLOGY.values():
@@ -961,8 +983,6 @@ CREATE TABLE {table_name} (
             schema_context += "\n".join([col for col in organized_columns if col.strip()])
             schema_context += "\n);\n"
 
-        conn.close()
-
         # Add business intelligence context
         schema_context += f"""
 
@@ -1,5 +1,5 @@
 """Prompt library for converSQL AI interactions."""
 
-from .sql_generation import build_sql_generation_prompt
+from .sql_generation import SQL_GENERATION_GUIDANCE, build_sql_generation_prompt, split_sql_generation_prompt
 
-__all__ = ["build_sql_generation_prompt"]
+__all__ = ["SQL_GENERATION_GUIDANCE", "build_sql_generation_prompt", "split_sql_generation_prompt"]
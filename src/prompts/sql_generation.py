@@ -2,7 +2,7 @@
 
 from __future__ import annotations
 
-from typing import Final
+from typing import Final, Optional, Tuple
 
 _PROMPT_PREAMBLE: Final[str] = (
     "You are an expert Single Family Loan loan performance data analyst. "
@@ -10,16 +10,7 @@ _PROMPT_PREAMBLE: Final[str] = (
 )
 
 
-def build_sql_generation_prompt(user_question: str, schema_context: str) -> str:
-    """Construct the full SQL generation prompt for the AI adapters."""
-    return f"""{_PROMPT_PREAMBLE}
-
-Database Schema Context:
-{schema_context}
-
-User Question: {user_question}
-
-LOAN PERFORMANCE DOMAIN EXPERTISE:
+_PROMPT_GUIDANCE: Final[str] = """LOAN PERFORMANCE DOMAIN EXPERTISE:
 You are an expert in single-family mortgage loan analytics with deep understanding of loan performance, risk assessment, and portfolio management.
 This represents a comprehensive single-family loan portfolio with deep performance history.
 
@@ -86,6 +77,40 @@ ADVANCED QUERY PATTERNS:
 - Rates: ROUND(AVG(ORIG_RATE),3) for precision, compare to market benchmarks
 - Performance: Calculate current/delinquent ratios, use weighted averages for UPB
 - Always filter NULL values: WHERE field IS NOT NULL for meaningful analysis
-- Use LIMIT 20 for top analyses unless specified otherwise
+- Use LIMIT 20 for top analyses unless specified otherwise"""
+
 
-Write ONLY the SQL query - no explanations:"""
+# Static preamble and domain guidance every prompt starts with. Keeping the
+# byte-identical part first lets providers cache it (Anthropic prompt caching,
+# Gemini context caching) and only process the schema and question per call.
+SQL_GENERATION_GUIDANCE: Final[str] = f"{_PROMPT_PREAMBLE}\n\n{_PROMPT_GUIDANCE}"
+
+# The dynamic parts follow in order of how often they change: the schema, then
+# the question. A single join allocates the result once.
+_PROMPT_SCHEMA_HEADER: Final[str] = "\n\nDatabase Schema Context:\n"
+_PROMPT_MIDDLE: Final[str] = "\n\nUser Question: "
+_PROMPT_TAIL: Final[str] = "\n\nWrite ONLY the SQL query - no explanations:"
+
+
+def build_sql_generation_prompt(user_question: str, schema_context: str) -> str:
+    """Construct the full SQL generation prompt for the AI adapters."""
+    return "".join(
+        (SQL_GENERATION_GUIDANCE, _PROMPT_SCHEMA_HEADER, schema_context, _PROMPT_MIDDLE, user_question, _PROMPT_TAIL)
+    )
+
+
+def split_sql_generation_prompt(prompt: str) -> Optional[Tuple[str, str, str]]:
+    """
+    Split a prompt from build_sql_generation_prompt into its cacheable parts.
+
+    Returns:
+        (guidance, schema_part, question_part) with leading blank lines removed,
+        or None when the prompt was not built by build_sql_generation_prompt.
+    """
+    if not prompt.startswith(SQL_GENERATION_GUIDANCE):
+        return None
+    rest = prompt[len(SQL_GENERATION_GUIDANCE) :]
+    split_at = rest.rfind(_PROMPT_MIDDLE)
+    if split_at < 0:
+        return None
+    return SQL_GENERATION_GUIDANCE, rest[:split_at].lstrip("\n"), rest[split_at:].lstrip("\n")
@@ -1,8 +1,7 @@
 import logging
 import math
 import os
-import subprocess
-import sys
+import threading
 from contextlib import closing
 from pathlib import Path
 from typing import List
@@ -13,6 +12,7 @@ import streamlit as st
 from dotenv import load_dotenv
 
 from src.data_dictionary import generate_enhanced_schema_context
+from src.utils import FileFingerprint, fingerprint_files
 from src.visualization import render_visualization
 
 # Load environment variables
@@ -24,6 +24,10 @@ logger = logging.getLogger(__name__)
 PROCESSED_DATA_DIR = Path(os.getenv("PROCESSED_DATA_DIR", "data/processed/"))
 CACHE_TTL = int(os.getenv("CACHE_TTL", "3600"))  # 1 hour default
 
+# Set once local data has been verified (or synced) in this process
+_data_verified = False
+_data_sync_lock = threading.Lock()
+
 
 def format_file_size(size_bytes: int) -> str:
     """Convert bytes to human readable format."""
@@ -85,41 +89,63 @@ def display_results(result_df: pd.DataFrame, title: str, execution_time: float =
         st.warning("⚠️ No results found")
 
 
-@st.cache_data(ttl=CACHE_TTL)
+def _list_parquet_files() -> List[Path]:
+    """Return the sorted parquet files in PROCESSED_DATA_DIR, or [] if it is missing."""
+    try:
+        with os.scandir(PROCESSED_DATA_DIR) as entries:
+            return sorted(
+                Path(entry.path)
+                for entry in entries
+                if entry.name.endswith(".parquet") and entry.is_file(follow_symlinks=False)
+            )
+    except FileNotFoundError:
+        return []
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner="🔄 Loading data files...")
 def load_parquet_files() -> List[str]:
     """Scan the processed directory for Parquet files. Cached for performance."""
     # Check if data sync is needed
     sync_data_if_needed()
 
-    if not PROCESSED_DATA_DIR.exists():
-        return []
-
-    parquet_files = sorted(PROCESSED_DATA_DIR.glob("*.parquet"))
-
-    return [str(path) for path in parquet_files]
+    return [str(path) for path in _list_parquet_files()]
 
 
 def sync_data_if_needed(force: bool = False) -> bool:
     """Check if data sync from R2 is needed and perform if necessary.
 
+    Local data is verified once per process; later calls return immediately
+    unless ``force`` is set. Concurrent callers wait for the check in progress.
+
     Args:
         force: If True, force sync even if data exists
 
     Returns:
         bool: True if data is available, False if sync failed
     """
+    global _data_verified
+    if _data_verified and not force:
+        return True
+    with _data_sync_lock:
+        if _data_verified and not force:
+            return True
+        _data_verified = _sync_data(force)
+        return _data_verified
+
+
+def _sync_data(force: bool) -> bool:
     try:
         # Check if processed directory exists and has valid data
-        if not force and PROCESSED_DATA_DIR.exists():
-            parquet_files = sorted(PROCESSED_DATA_DIR.glob("*.parquet"))
+        if not force:
+            parquet_files = _list_parquet_files()
             if parquet_files:
-                # Verify files are not empty/corrupted
+                # Verify files are readable and not empty (row count comes from the footer)
                 try:
                     with closing(duckdb.connect()) as conn:
-                        test_query = f"SELECT COUNT(*) FROM '{parquet_files[0]}'"
-                        row = conn.execute(test_query).fetchone()
+                        test_query = "SELECT SUM(num_rows) FROM parquet_file_metadata(?)"
+                        row = conn.execute(test_query, [str(parquet_files[0])]).fetchone()
 
-                    if row and row[0] > 0:
+                    if row and row[0]:
                         logger.info("Found %d valid parquet file(s) with data", len(parquet_files))
                         return True
                     logger.warning("Existing parquet files appear empty; rerunning sync")
@@ -130,30 +156,28 @@ def sync_data_if_needed(force: bool = False) -> bool:
         sync_reason = "Force sync requested" if force else "No valid local data found"
         logger.info("%s. Attempting R2 sync…", sync_reason)
 
-        sync_args = [sys.executable, "scripts/sync_data.py"]
-        if force:
-            sync_args.append("--force")
+        # Imported here so boto3 only loads when a sync actually runs
+        from src.sync import sync
 
-        sync_result = subprocess.run(sync_args, capture_output=True, text=True)
-
-        if sync_result.returncode == 0:
+        if sync(force=force):
             logger.info("R2 sync completed successfully")
             return True
-        else:
-            logger.error("R2 sync failed: %s", sync_result.stderr.strip())
-            if sync_result.stdout:
-                logger.debug("Sync output: %s", sync_result.stdout.strip())
-            return False
+        logger.error("R2 sync failed")
+        return False
 
     except Exception as e:
         logger.error("Error during data sync", exc_info=e)
         return False
 
 
-@st.cache_data(ttl=CACHE_TTL)
 def load_schema_context(parquet_files: List[str]) -> str:
-    """Generate enhanced CREATE TABLE statements with rich metadata. Cached for performance."""
+    """Generate enhanced CREATE TABLE statements with rich metadata. Cached on file mtime and size."""
     if not parquet_files:
         return ""
 
-    return generate_enhanced_schema_context(parquet_files)
+    return _build_schema_context(fingerprint_files(parquet_files))
+
+
+@st.cache_data(max_entries=8, show_spinner="🔄 Building schema context...")
+def _build_schema_context(fingerprint: FileFingerprint) -> str:
+    return generate_enhanced_schema_context([file_path for file_path, _, _ in fingerprint])
@@ -30,6 +30,17 @@ GOOGLE_AUTH_URL = "https://accounts.google.com/o/oauth2/v2/auth"
 GOOGLE_TOKEN_URL = "https://oauth2.googleapis.com/token"
 GOOGLE_USERINFO_URL = "https://www.googleapis.com/oauth2/v2/userinfo"
 
+# Session state cleared on sign out
+_SIGN_OUT_KEYS = (
+    "user",
+    "oauth_state",
+    "generated_sql",
+    "bedrock_error",
+    "user_question",
+    "show_edit_sql",
+    "query_history",
+)
+
 
 def get_current_url() -> str:
     """Get the current app URL for OAuth redirects."""
@@ -242,12 +253,11 @@ class SimpleAuth:
         """Check if user is authenticated."""
         if not self.enabled:
             return True  # Skip auth if disabled
-        return "user" in st.session_state and st.session_state.user is not None
+        return st.session_state.get("user") is not None
 
     def get_current_user(self) -> Optional[Dict[str, Any]]:
         """Get current authenticated user."""
-        if not self.is_authenticated():
-            return None
+        # A stored user implies authentication, so one lookup answers both questions
         return st.session_state.get("user")
 
     def get_auth_url(self) -> str:
@@ -258,9 +268,6 @@ class SimpleAuth:
 
     def log_query(self, question: str, sql_query: str, provider: str, execution_time: float):
         """Log user query to both session and D1 database."""
-        if not self.is_authenticated():
-            return
-
         user = self.get_current_user()
         if not user:
             return
@@ -295,22 +302,9 @@ class SimpleAuth:
 
     def sign_out(self):
         """Sign out current user."""
-        if "user" in st.session_state:
-            del st.session_state.user
-
-        # Clear other session data
-        keys_to_clear = [
-            "oauth_state",
-            "generated_sql",
-            "bedrock_error",
-            "user_question",
-            "show_edit_sql",
-            "query_history",
-        ]
-
-        for key in keys_to_clear:
-            if key in st.session_state:
-                del st.session_state[key]
+        # Clear the user and other session data
+        for key in _SIGN_OUT_KEYS:
+            st.session_state.pop(key, None)
 
 
 # Global auth service instance
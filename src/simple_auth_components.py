@@ -13,14 +13,8 @@ from .core import get_ai_service_status
 from .simple_auth import get_auth_service, handle_oauth_callback
 from .ui import render_app_footer
 
-
-def render_login_page():
-    """Render the login page with Google OAuth."""
-    auth = get_auth_service()
-
-    # Inject converSQL-specific styling for the login experience
-    st.markdown(
-        """
+# Static login page markup, built once at import rather than on every rerun
+_LOGIN_CSS = """
     <style>
     :root {
         --color-background: #FAF6F0;
@@ -164,34 +158,14 @@ def render_login_page():
     }
 
     </style>
-    """,
-        unsafe_allow_html=True,
-    )
-
-    # Center the login content
-    col1, col2, col3 = st.columns([1, 2, 1])
+    """
 
-    with col2:
-        logo_data_uri = get_logo_data_uri()
-        if logo_data_uri:
-            logo_block = "<div class='login-logo'>" f"<img src='{logo_data_uri}' alt='converSQL logo' />" "</div>"
-        else:
-            logo_block = "<div class='login-logo login-logo--fallback'>💬 converSQL</div>"
+_LOGIN_LOGO_FALLBACK_HTML = "<div class='login-logo login-logo--fallback'>💬 converSQL</div>"
 
-        auth_url = auth.get_auth_url()
-        demo_mode = os.getenv("DEMO_MODE", "false").lower() == "true"
+_LOGIN_CTA_DISABLED_HTML = "<div class='login-button login-button--disabled'>❌ Google OAuth unavailable</div>"
 
-        if auth_url:
-            login_cta = (
-                f"<a class='login-button' href='{auth_url}' target='_self' rel='noopener noreferrer'>"
-                "🔐 <span>Sign in with Google</span>"
-                "</a>"
-            )
-        else:
-            login_cta = "<div class='login-button login-button--disabled'>" "❌ Google OAuth unavailable" "</div>"
-
-        st.markdown(
-            f"""
+# Filled with the per-request logo block and sign-in link via str.format
+_LOGIN_CARD_HTML = """
         <div class='login-wrapper'>
             <div class='login-hero'>
                 {logo_block}
@@ -212,7 +186,49 @@ def render_login_page():
             </div>
         </div>
         <div class='login-divider'></div>
-        """,
+        """
+
+_ABOUT_MARKDOWN = """
+            **converSQL** pairs ontological intelligence with natural language interfaces to deliver:
+
+            - 🤖 **AI-Guided SQL** – Structured prompts that bake in mortgage risk heuristics.
+            - 🧠 **Ontology-Aware Context** – 15 business domains and 110+ field definitions on tap.
+            - ⚡ **Streamlined Execution** – DuckDB acceleration, cached schema, and curated prompts.
+            - 🔒 **Enterprise Guardrails** – OAuth sign-in, optional audit logging, and provider failovers.
+            """
+
+
+def render_login_page():
+    """Render the login page with Google OAuth."""
+    auth = get_auth_service()
+
+    # Inject converSQL-specific styling for the login experience
+    st.markdown(_LOGIN_CSS, unsafe_allow_html=True)
+
+    # Center the login content
+    col1, col2, col3 = st.columns([1, 2, 1])
+
+    with col2:
+        logo_data_uri = get_logo_data_uri()
+        if logo_data_uri:
+            logo_block = "<div class='login-logo'>" f"<img src='{logo_data_uri}' alt='converSQL logo' />" "</div>"
+        else:
+            logo_block = _LOGIN_LOGO_FALLBACK_HTML
+
+        auth_url = auth.get_auth_url()
+        demo_mode = os.getenv("DEMO_MODE", "false").lower() == "true"
+
+        if auth_url:
+            login_cta = (
+                f"<a class='login-button' href='{auth_url}' target='_self' rel='noopener noreferrer'>"
+                "🔐 <span>Sign in with Google</span>"
+                "</a>"
+            )
+        else:
+            login_cta = _LOGIN_CTA_DISABLED_HTML
+
+        st.markdown(
+            _LOGIN_CARD_HTML.format(logo_block=logo_block, login_cta=login_cta),
             unsafe_allow_html=True,
         )
 
@@ -225,16 +241,7 @@ def render_login_page():
 
         # Info section
         with st.expander("ℹ️ About This Application", expanded=False):
-            st.markdown(
-                """
-            **converSQL** pairs ontological intelligence with natural language interfaces to deliver:
-
-            - 🤖 **AI-Guided SQL** – Structured prompts that bake in mortgage risk heuristics.
-            - 🧠 **Ontology-Aware Context** – 15 business domains and 110+ field definitions on tap.
-            - ⚡ **Streamlined Execution** – DuckDB acceleration, cached schema, and curated prompts.
-            - 🔒 **Enterprise Guardrails** – OAuth sign-in, optional audit logging, and provider failovers.
-            """
-            )
+            st.markdown(_ABOUT_MARKDOWN)
 
         # Footer matching main app styling
         ai_status = get_ai_service_status()
@@ -0,0 +1,485 @@
+#!/usr/bin/env python3
+"""
+Cloudflare R2 Data Sync
+Downloads and syncs data from R2 bucket to local storage.
+Called in-process by the app (see ``sync``) and at container startup via
+``scripts/sync_data.py``.
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import math
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import boto3
+from botocore.config import Config as BotoConfig
+from botocore.exceptions import ClientError, NoCredentialsError
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Configuration from environment
+R2_ENDPOINT_URL = os.getenv("R2_ENDPOINT_URL", "https://50ee71713e4e8762d5eab0e8ec442f1e.r2.cloudflarestorage.com")
+R2_BUCKET_NAME = os.getenv("R2_BUCKET_NAME", "single-family-loan")
+R2_ACCESS_KEY_ID = os.getenv("R2_ACCESS_KEY_ID")
+R2_SECRET_ACCESS_KEY = os.getenv("R2_SECRET_ACCESS_KEY")
+R2_PREFIX = os.getenv("R2_PREFIX", "")
+LOCAL_DATA_DIR = os.getenv("PROCESSED_DATA_DIR", "data/processed/")
+FORCE_REFRESH = os.getenv("FORCE_DATA_REFRESH", "false").lower() == "true"
+MD5_CHUNK_SIZE = 1 << 20  # 1 MiB reads keep syscall overhead low on large parquet files
+HASH_WORKERS = os.cpu_count() or 4
+DOWNLOAD_WORKERS = int(os.getenv("R2_DOWNLOAD_WORKERS", "8"))
+HEAD_WORKERS = 64
+TRANSFER_CONCURRENCY = 10  # s3transfer's default threads per download_file call
+MAX_POOL_CONNECTIONS = int(
+    os.getenv("R2_MAX_POOL_CONNECTIONS", str(max(HEAD_WORKERS, DOWNLOAD_WORKERS * TRANSFER_CONCURRENCY)))
+)
+MANIFEST_PATH = os.path.join(LOCAL_DATA_DIR, ".r2_manifest.json")
+SYNC_TTL = int(os.getenv("R2_SYNC_TTL", "60"))  # seconds a successful sync is trusted without listing R2
+
+
+def new_md5():
+    """Create an MD5 object for integrity checks (not used for security)."""
+    return hashlib.new("md5", usedforsecurity=False)
+
+
+def get_file_md5(file_path):
+    """Calculate MD5 hash of a file."""
+    if not os.path.exists(file_path):
+        return None
+
+    with open(file_path, "rb", buffering=0) as f:
+        if hasattr(hashlib, "file_digest"):
+            # Python 3.11+: hashing loop runs in C
+            return hashlib.file_digest(f, new_md5).hexdigest()
+
+        hash_md5 = new_md5()
+        read, update = f.read, hash_md5.update
+        while chunk := read(MD5_CHUNK_SIZE):
+            update(chunk)
+    return hash_md5.hexdigest()
+
+
+def get_multipart_etag(file_path, part_count, part_size=None):
+    """Compute an S3-style multipart ETag (``md5(md5_1 + ... + md5_n)-n``) for a local file.
+
+    The part size is not part of the ETag; when it is not known from R2, assume
+    the uploader used equal whole-MiB parts. Parts are hashed concurrently;
+    hashlib releases the GIL on large buffers so threads scale across cores.
+    """
+    if not part_size:
+        size = os.path.getsize(file_path)
+        part_size = max(1, math.ceil(size / part_count / MD5_CHUNK_SIZE)) * MD5_CHUNK_SIZE
+
+    def digest_part(index):
+        hash_md5 = new_md5()
+        with open(file_path, "rb", buffering=0) as f:
+            f.seek(index * part_size)
+            read, update = f.read, hash_md5.update
+            remaining = part_size
+            while remaining > 0 and (chunk := read(min(MD5_CHUNK_SIZE, remaining))):
+                update(chunk)
+                remaining -= len(chunk)
+        return hash_md5.digest()
+
+    with ThreadPoolExecutor(max_workers=min(HASH_WORKERS, part_count)) as pool:
+        digests = list(pool.map(digest_part, range(part_count)))
+
+    combined = new_md5()
+    combined.update(b"".join(digests))
+    return f"{combined.hexdigest()}-{part_count}"
+
+
+def load_manifest():
+    """Load the sync manifest: when the last full sync finished and the ETags it recorded.
+
+    Entries are keyed by local file name.
+    """
+    try:
+        with open(MANIFEST_PATH, "r") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+
+    if not isinstance(manifest, dict):
+        manifest = {}
+    entries = manifest.get("entries")
+    generated_at = manifest.get("generated_at")
+    return {
+        "generated_at": generated_at if isinstance(generated_at, (int, float)) else None,
+        "entries": entries if isinstance(entries, dict) else {},
+    }
+
+
+def save_manifest(entries, complete):
+    """Persist the sync manifest atomically.
+
+    ``generated_at`` is only stamped when every listed file synced, so a partial
+    sync never lets the next run skip the R2 listing.
+    """
+    manifest = {"generated_at": time.time() if complete else None, "entries": entries}
+    tmp_path = MANIFEST_PATH + ".tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, MANIFEST_PATH)
+    except OSError as e:
+        logger.warning("Could not write sync manifest", exc_info=e)
+
+
+def is_manifest_fresh(manifest):
+    """Check whether the last successful sync is recent enough to skip listing R2."""
+    generated_at = manifest["generated_at"]
+    entries = manifest["entries"]
+    if generated_at is None or not entries or time.time() - generated_at >= SYNC_TTL:
+        return False
+
+    # The local copies must still be the ones that were synced
+    for name, entry in entries.items():
+        local_path = os.path.join(LOCAL_DATA_DIR, name)
+        try:
+            if os.path.getsize(local_path) != entry.get("size"):
+                return False
+        except (OSError, AttributeError):
+            return False
+    return True
+
+
+def record_entry(entries, local_path, obj):
+    """Record the R2 object a local file was synced from."""
+    entries[os.path.basename(local_path)] = {"key": obj["key"], "etag": obj["etag"], "size": obj["size"]}
+
+
+def get_cached_etag(entries, local_path):
+    """Return the ETag recorded for a local file, if any."""
+    entry = entries.get(os.path.basename(local_path))
+    return entry.get("etag") if isinstance(entry, dict) else None
+
+
+def is_file_current(local_path, obj, entries):
+    """Check whether a local file matches an R2 object without re-reading it when possible."""
+    if not os.path.exists(local_path):
+        logger.info("Local file missing: %s", obj["key"])
+        return False
+
+    local_size = os.path.getsize(local_path)
+    if local_size != obj["size"]:
+        logger.info("Size mismatch for %s: local=%d, R2=%d", obj["key"], local_size, obj["size"])
+        return False
+
+    cached_etag = get_cached_etag(entries, local_path)
+    if cached_etag is not None:
+        if cached_etag != obj["etag"]:
+            logger.info("ETag changed for %s", obj["key"])
+            return False
+        return True
+
+    # No recorded ETag: hash the local file the same way R2 computed the ETag
+    etag = obj["etag"]
+    if "-" in etag:
+        _, _, part_count = etag.rpartition("-")
+        if not part_count.isdigit():
+            return True
+        local_etag = get_multipart_etag(local_path, int(part_count), obj.get("part_size"))
+    else:
+        local_etag = get_file_md5(local_path)
+
+    if local_etag != etag:
+        logger.info("Checksum mismatch for %s", obj["key"])
+        return False
+
+    record_entry(entries, local_path, obj)
+    return True
+
+
+def create_r2_client():
+    """Create and return R2 client."""
+    if not R2_ACCESS_KEY_ID or not R2_SECRET_ACCESS_KEY:
+        logger.error("R2 credentials not found. Please set R2_ACCESS_KEY_ID and R2_SECRET_ACCESS_KEY")
+        return None
+
+    try:
+        client = boto3.client(
+            "s3",
+            endpoint_url=R2_ENDPOINT_URL,
+            aws_access_key_id=R2_ACCESS_KEY_ID,
+            aws_secret_access_key=R2_SECRET_ACCESS_KEY,
+            region_name="auto",  # Cloudflare R2 uses 'auto'
+            config=BotoConfig(
+                # Size the pool for concurrent downloads so requests never queue for a connection
+                max_pool_connections=MAX_POOL_CONNECTIONS,
+                retries={"max_attempts": 5, "mode": "adaptive"},
+                tcp_keepalive=True,
+                connect_timeout=3,
+                read_timeout=60,
+            ),
+        )
+
+        # Test connection
+        client.head_bucket(Bucket=R2_BUCKET_NAME)
+        logger.info("Connected to R2 bucket: %s", R2_BUCKET_NAME)
+        return client
+
+    except (ClientError, NoCredentialsError) as e:
+        logger.error("Failed to connect to R2: %s", e)
+        return None
+
+
+def list_r2_objects(client):
+    """List all objects in the R2 bucket (paginated past the 1000-key limit)."""
+    try:
+        paginator = client.get_paginator("list_objects_v2")
+        pages = paginator.paginate(Bucket=R2_BUCKET_NAME, Prefix=R2_PREFIX, PaginationConfig={"PageSize": 1000})
+
+        objects = []
+        for page in pages:
+            for obj in page.get("Contents", []):
+                # Focus on parquet files
+                if obj["Key"].endswith(".parquet"):
+                    objects.append(
+                        {
+                            "key": obj["Key"],
+                            "size": obj["Size"],
+                            "last_modified": obj["LastModified"],
+                            "etag": obj["ETag"].strip('"'),
+                        }
+                    )
+
+        if not objects:
+            logger.warning("No parquet objects found in R2 bucket")
+            return []
+
+        logger.info("Found %d parquet files in R2", len(objects))
+        return objects
+
+    except ClientError as e:
+        logger.error("Error listing R2 objects: %s", e)
+        return []
+
+
+def release_page_cache(local_path):
+    """Ask the kernel to drop a freshly written file from the page cache (Linux only).
+
+    Downloads can be far larger than RAM on small hosts; without the hint their
+    pages evict warmer data while many files are written in parallel.
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return
+
+    try:
+        fd = os.open(local_path, os.O_RDONLY)
+        try:
+            os.fdatasync(fd)  # dirty pages cannot be dropped until written back
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+    except OSError:
+        pass
+
+
+def fetch_part_sizes(client, r2_objects, local_files, entries):
+    """Look up the upload part size of multipart objects that still need verifying.
+
+    The listing already carries size and ETag, so HEAD requests are only sent
+    for objects without a manifest entry whose same-sized local copy must be
+    checked against a multipart ETag. All probes go out in one concurrent wave.
+    """
+    pending = [
+        obj
+        for obj, local_file in zip(r2_objects, local_files)
+        if "-" in obj["etag"]
+        and get_cached_etag(entries, local_file) is None
+        and os.path.exists(local_file)
+        and os.path.getsize(local_file) == obj["size"]
+    ]
+    if not pending:
+        return
+
+    def head_first_part(obj):
+        try:
+            response = client.head_object(Bucket=R2_BUCKET_NAME, Key=obj["key"], PartNumber=1)
+            obj["part_size"] = response.get("ContentLength")
+        except ClientError as e:
+            logger.warning("Could not read part size for %s: %s", obj["key"], e)
+
+    with ThreadPoolExecutor(max_workers=min(HEAD_WORKERS, len(pending))) as pool:
+        list(pool.map(head_first_part, pending))
+
+
+def download_file(client, r2_key, local_path):
+    """Download a single file from R2."""
+    try:
+        # Ensure local directory exists
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+
+        logger.info("Downloading %s to %s", r2_key, local_path)
+        client.download_file(R2_BUCKET_NAME, r2_key, local_path)
+
+        # Verify download
+        if os.path.exists(local_path) and os.path.getsize(local_path) > 0:
+            release_page_cache(local_path)
+            logger.info("Successfully downloaded %s", r2_key)
+            return True
+        else:
+            logger.error("Download failed or file is empty: %s", r2_key)
+            return False
+
+    except ClientError as e:
+        logger.error("Error downloading %s: %s", r2_key, e)
+        return False
+
+
+def sync_data(force=FORCE_REFRESH, refresh=False):
+    """Main sync function; ``force`` re-downloads every file.
+
+    ``refresh`` lists R2 even right after a successful sync, but still only
+    downloads files whose ETag changed.
+    """
+    logger.info("Starting R2 data sync...")
+
+    # Create local data directory
+    Path(LOCAL_DATA_DIR).mkdir(parents=True, exist_ok=True)
+
+    # A sync that finished moments ago (e.g. a restarting container) needs no R2 round-trip
+    manifest = {"generated_at": None, "entries": {}} if force else load_manifest()
+    if not (force or refresh) and is_manifest_fresh(manifest):
+        logger.info("Last sync finished less than %ds ago; skipping R2 listing", SYNC_TTL)
+        return True
+
+    # Create R2 client
+    client = create_r2_client()
+    if not client:
+        logger.error("Cannot proceed without R2 connection")
+        return False
+
+    # List R2 objects
+    r2_objects = list_r2_objects(client)
+    if not r2_objects:
+        logger.error("No data files found in R2")
+        return False
+
+    # Sync each file
+    success_count = 0
+    total_files = len(r2_objects)
+    local_files = [os.path.join(LOCAL_DATA_DIR, os.path.basename(obj["key"])) for obj in r2_objects]
+    entries = manifest["entries"]
+
+    # Check which files need downloading; files are hashed concurrently when no ETag is recorded
+    if force:
+        up_to_date = [False] * total_files
+    else:
+        fetch_part_sizes(client, r2_objects, local_files, entries)
+        with ThreadPoolExecutor(max_workers=HASH_WORKERS) as pool:
+            up_to_date = list(pool.map(is_file_current, local_files, r2_objects, [entries] * total_files))
+
+    to_download = []
+    for obj, local_file, is_current in zip(r2_objects, local_files, up_to_date):
+        if is_current:
+            logger.info("File up to date: %s", obj["key"])
+            success_count += 1
+        else:
+            to_download.append((obj, local_file))
+
+    # Download outstanding files concurrently; boto3 clients are thread-safe
+    if to_download:
+
+        def download_one(item):
+            obj, local_file = item
+            return download_file(client, obj["key"], local_file)
+
+        with ThreadPoolExecutor(max_workers=max(1, min(DOWNLOAD_WORKERS, len(to_download)))) as pool:
+            for (obj, local_file), downloaded in zip(to_download, pool.map(download_one, to_download)):
+                if downloaded:
+                    record_entry(entries, local_file, obj)
+                    success_count += 1
+                else:
+                    entries.pop(os.path.basename(local_file), None)
+                    logger.error("Failed to download %s", obj["key"])
+
+    save_manifest(entries, complete=success_count == total_files)
+
+    logger.info(
+        "Sync summary: %d total, %d successful, %d failed",
+        total_files,
+        success_count,
+        total_files - success_count,
+    )
+
+    if success_count == total_files:
+        logger.info("Data sync completed successfully")
+        return True
+    else:
+        logger.warning("Data sync completed with errors")
+        return False
+
+
+def check_data_availability():
+    """Check if data is available locally."""
+    if not os.path.exists(LOCAL_DATA_DIR):
+        return False
+
+    parquet_files = [f for f in os.listdir(LOCAL_DATA_DIR) if f.endswith(".parquet")]
+
+    if not parquet_files:
+        logger.info("No parquet files found in %s", LOCAL_DATA_DIR)
+        return False
+
+    logger.info("Found %d parquet files locally", len(parquet_files))
+    return True
+
+
+def sync(force=False):
+    """Make sure local data is available, syncing from R2 when missing or forced.
+
+    ``force`` checks R2 even when local files exist, re-downloading only files
+    whose ETag changed; ``FORCE_DATA_REFRESH=true`` re-downloads every file.
+
+    Returns:
+        bool: True if data is available, False if the sync failed
+    """
+    # Check if data already exists and no refresh was requested
+    if not (FORCE_REFRESH or force) and check_data_availability():
+        logger.info(
+            "Data already available locally; skipping sync. "
+            "Use --force to check R2 for updates or FORCE_DATA_REFRESH=true to re-download"
+        )
+        return True
+
+    if FORCE_REFRESH:
+        logger.info("Force refresh enabled - will re-download data")
+    elif force:
+        logger.info("Refresh requested - checking R2 for changed files")
+
+    return sync_data(force=FORCE_REFRESH, refresh=force)
+
+
+def main(argv=None):
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Sync data from Cloudflare R2")
+    parser.add_argument("--force", action="store_true", help="Check R2 for changed files even if data exists")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    print("=" * 50)
+    print("🌤️  Cloudflare R2 Data Sync")
+    print("=" * 50)
+
+    if sync(force=args.force):
+        print("\n🎉 Data sync successful! Application ready to start.")
+        return 0
+    else:
+        print("\n❌ Data sync failed! Check configuration and try again.")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,6 +9,8 @@ from typing import Any, Dict, List, Optional, Union
 import pandas as pd
 import streamlit as st
 
+from src.utils import group_parquet_tables
+
 
 @st.cache_data
 def format_file_size(size_bytes: float) -> str:
@@ -263,16 +265,16 @@ def render_status_badge(status: str, is_active: bool = False) -> str:
 
 @st.cache_data
 def get_table_info(parquet_files: List[str]) -> Dict[str, Any]:
-    """Get cached table information."""
+    """Get cached table information, keyed by the table names queries use."""
     table_info = {}
 
-    for file_path in parquet_files:
-        if os.path.exists(file_path):
-            table_name = os.path.splitext(os.path.basename(file_path))[0]
-            file_size = os.path.getsize(file_path)
+    for table_name, file_paths in group_parquet_tables(parquet_files).items():
+        file_paths = [file_path for file_path in file_paths if os.path.exists(file_path)]
+        if file_paths:
+            file_size = sum(os.path.getsize(file_path) for file_path in file_paths)
 
             table_info[table_name] = {
-                "file_path": file_path,
+                "file_path": ", ".join(file_paths),
                 "size": file_size,
                 "size_formatted": format_file_size(file_size),
             }
@@ -7,6 +7,7 @@ from src.branding import get_logo_data_uri
 from src.services.ai_service import get_ai_service_status
 from src.services.data_service import format_file_size
 from src.simple_auth import get_auth_service
+from src.utils import group_parquet_tables
 
 DEMO_MODE = os.getenv("DEMO_MODE", "false").lower() == "true"
 
@@ -97,8 +98,12 @@ def render_sidebar():
                 for provider_key, is_available in status.items():
                     if provider_key != "active":
                         provider_display = provider_key.title()
-                        icon = "✅" if is_available else "❌"
-                        status_text = "Available" if is_available else "Unavailable"
+                        if is_available is None:
+                            # Configured, but its adapter is only built once selected
+                            icon, status_text = "⚪", "Not loaded yet"
+                        else:
+                            icon = "✅" if is_available else "❌"
+                            status_text = "Available" if is_available else "Unavailable"
                         active_marker = " **(Active)**" if provider_key == ai_status["active_provider"] else ""
                         st.markdown(f"- **{provider_display}**: {icon} {status_text}{active_marker}")
         else:
@@ -176,8 +181,7 @@ def render_sidebar():
         with st.expander("📋 Available Tables", expanded=False):
             parquet_files = st.session_state.get("parquet_files", [])
             if parquet_files:
-                for file_path in parquet_files:
-                    table_name = os.path.splitext(os.path.basename(file_path))[0]
+                for table_name in group_parquet_tables(parquet_files):
                     st.markdown(
                         f"<div style='color: var(--color-text-primary); margin: 0.25rem 0;'>• <span style='font-weight: 500;'>{table_name}</span></div>",
                         unsafe_allow_html=True,
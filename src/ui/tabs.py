@@ -87,9 +87,20 @@ def render_tabs():
 
         if generate_button and is_ai_ready:
             with st.spinner(f"🧠 {provider_name} is analyzing your question..."):
+                # Show the SQL as it streams in; replaced by the final result below
+                stream_placeholder = st.empty()
+                streamed_chunks = []
+
+                def show_partial_sql(text):
+                    streamed_chunks.append(text)
+                    stream_placeholder.code("".join(streamed_chunks), language="sql")
+
                 start_time = time.time()
-                sql_query, error_msg = generate_sql_with_ai(user_question, st.session_state.get("schema_context", ""))
+                sql_query, error_msg = generate_sql_with_ai(
+                    user_question, st.session_state.get("schema_context", ""), on_token=show_partial_sql
+                )
                 ai_generation_time = time.time() - start_time
+                stream_placeholder.empty()
                 st.session_state.generated_sql = sql_query
                 st.session_state.ai_error = error_msg
                 # Hide Edit panel on fresh generation to avoid empty editor gaps
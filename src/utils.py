@@ -1,9 +1,15 @@
-from typing import Dict
+import os
+import re
+from collections import Counter
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
 
+# Time or part suffix on partitioned files, e.g. data_2020Q1, data_202001, data_part3
+_PARTITION_SUFFIX_RE = re.compile(r"^(?P<table>.+?)_(?:\d{4}(?:Q[1-4]|\d{2})?|part-?\d+)$", re.IGNORECASE)
 
-def get_analyst_questions() -> Dict[str, str]:
-    """Return sophisticated analyst questions leveraging loan performance domain expertise."""
-    return {
+# Built once at import; read-only because every caller shares the same mapping
+_ANALYST_QUESTIONS: Mapping[str, str] = MappingProxyType(
+    {
         "🎯 Portfolio Health Check": "Show me our current portfolio composition by credit risk tiers (Super Prime 740+, Prime 680-739, Near Prime 620-679, Subprime <620) with current UPB and delinquency rates",
         "🌎 Geographic Risk Assessment": "Which top 10 states have the highest loan concentrations and how do their current delinquency rates compare to the national average?",
         "📈 Vintage Performance Analysis": "Compare loan performance between 2020-2021 refi boom vintages vs 2022+ rising rate vintages - show loan counts, average rates, and current performance",
@@ -15,3 +21,55 @@ def get_analyst_questions() -> Dict[str, str]:
         "🌟 Super Prime Performance": "Analyze our Super Prime segment (740+ credit scores) - show portfolio share, average UPB, geographic distribution, and performance metrics",
         "🎲 Rate Sensitivity Analysis": "Compare current portfolio performance between ultra-low rate loans (2-4%) vs higher rate loans (5%+) - show delinquency rates and paydown behavior",
     }
+)
+
+
+def get_analyst_questions() -> Mapping[str, str]:
+    """Return sophisticated analyst questions leveraging loan performance domain expertise."""
+    return _ANALYST_QUESTIONS
+
+
+FileFingerprint = Tuple[Tuple[str, Optional[int], Optional[int]], ...]
+
+
+def fingerprint_files(paths: Iterable[str]) -> FileFingerprint:
+    """Return ``(path, mtime_ns, size)`` per file, for cache keys that change when a file does.
+
+    Missing files get ``None`` stats rather than raising.
+    """
+    fingerprint: List[Tuple[str, Optional[int], Optional[int]]] = []
+    for path in paths:
+        try:
+            stats = os.stat(path)
+            fingerprint.append((path, stats.st_mtime_ns, stats.st_size))
+        except OSError:
+            fingerprint.append((path, None, None))
+    return tuple(fingerprint)
+
+
+def group_parquet_tables(parquet_files: List[str], combine_partitions: Optional[bool] = None) -> Dict[str, List[str]]:
+    """Map table names to their parquet files.
+
+    Each file is its own table named after its stem. With
+    ``COMBINE_PARTITIONED_TABLES=true`` (or ``combine_partitions=True``), files
+    sharing a base name with a partition suffix (``data_2020Q1``,
+    ``data_2020Q2``) are combined into one table named after the base (``data``).
+    """
+    if combine_partitions is None:
+        combine_partitions = os.getenv("COMBINE_PARTITIONED_TABLES", "false").lower() == "true"
+
+    stems = {path: os.path.splitext(os.path.basename(path))[0] for path in parquet_files}
+    bases = {}
+    for path, stem in stems.items():
+        match = _PARTITION_SUFFIX_RE.match(stem) if combine_partitions else None
+        bases[path] = match.group("table") if match else None
+    partition_counts = Counter(base for base in bases.values() if base)
+    # A file already named after the base keeps the name; partitions then stay separate
+    taken = set(stems.values())
+
+    tables: Dict[str, List[str]] = {}
+    for path, stem in stems.items():
+        base = bases[path]
+        name = base if base and partition_counts[base] > 1 and base not in taken else stem
+        tables.setdefault(name, []).append(path)
+    return tables
@@ -3,9 +3,13 @@ Unit tests for adapter implementations
 Tests the actual behavior without complex mocking
 """
 
+import json
+from unittest.mock import MagicMock
+
 import pytest
 
-from src.ai_engines.base import AIEngineAdapter
+from src.ai_engines import bedrock_adapter
+from src.ai_engines.base import AIEngineAdapter, classify_api_error
 from src.ai_engines.bedrock_adapter import BedrockAdapter
 from src.ai_engines.claude_adapter import ClaudeAdapter
 from src.ai_engines.gemini_adapter import GeminiAdapter
@@ -59,6 +63,94 @@ class TestBedrockAdapter:
             assert sql == ""
             assert len(error) > 0
 
+    def test_initialization_skips_live_probe(self, monkeypatch):
+        """Test Bedrock initialization makes no API call unless verification is requested."""
+        boto3 = pytest.importorskip("boto3")
+        session = MagicMock()
+        session.get_credentials.return_value.get_frozen_credentials.return_value.access_key = "AKIA"
+        monkeypatch.setattr(boto3, "Session", MagicMock(return_value=session))
+        monkeypatch.setattr(bedrock_adapter, "_SESSION", None)
+        monkeypatch.setattr(bedrock_adapter, "_RUNTIME_CLIENTS", {})
+
+        adapter = BedrockAdapter()
+        assert adapter.is_available()
+        session.client.return_value.list_foundation_models.assert_not_called()
+
+        BedrockAdapter({"verify_on_init": True})
+        session.client.return_value.list_foundation_models.assert_called_once_with(maxResults=1)
+
+    def test_session_and_client_shared_across_instances(self, monkeypatch):
+        """Test Bedrock adapters reuse one boto3 Session and one runtime client per region."""
+        boto3 = pytest.importorskip("boto3")
+        session = MagicMock()
+        session.get_credentials.return_value.get_frozen_credentials.return_value.access_key = "AKIA"
+        session.client.side_effect = lambda *args, **kwargs: MagicMock()
+        session_factory = MagicMock(return_value=session)
+        monkeypatch.setattr(boto3, "Session", session_factory)
+        monkeypatch.setattr(bedrock_adapter, "_SESSION", None)
+        monkeypatch.setattr(bedrock_adapter, "_RUNTIME_CLIENTS", {})
+
+        first = BedrockAdapter({"region": "us-west-2"})
+        second = BedrockAdapter({"region": "us-west-2"})
+        other_region = BedrockAdapter({"region": "us-east-1"})
+
+        session_factory.assert_called_once()
+        assert first.client is second.client
+        assert other_region.client is not first.client
+
+        config = session.client.call_args_list[0].kwargs["config"]
+        assert config.max_pool_connections == bedrock_adapter.MAX_POOL_CONNECTIONS
+        assert config.retries == {"max_attempts": 3, "mode": "adaptive"}
+
+    def test_generate_sql_streams_tokens(self):
+        """Test Bedrock response streaming forwards text chunks and assembles the SQL."""
+        events = [
+            {"chunk": {"bytes": json.dumps({"type": "message_start"}).encode()}},
+            {
+                "chunk": {
+                    "bytes": json.dumps({"type": "content_block_delta", "delta": {"text": "```sql\nSELECT "}}).encode()
+                }
+            },
+            {"chunk": {"bytes": json.dumps({"type": "content_block_delta", "delta": {"text": "1\n```"}}).encode()}},
+            {"chunk": {"bytes": json.dumps({"type": "message_stop"}).encode()}},
+        ]
+        adapter = BedrockAdapter({"enable": False})
+        adapter.model_id = "test-model"
+        adapter.client = MagicMock()
+        adapter.client.invoke_model_with_response_stream.return_value = {"body": iter(events)}
+
+        tokens = []
+        sql, error = adapter.generate_sql("prompt", on_token=tokens.append)
+
+        assert (sql, error) == ("SELECT 1", "")
+        assert tokens == ["```sql\nSELECT ", "1\n```"]
+
+    @pytest.mark.parametrize("use_orjson", [True, False])
+    def test_json_helpers_round_trip(self, monkeypatch, use_orjson):
+        """Test Bedrock payload helpers work with and without orjson installed."""
+        if use_orjson:
+            pytest.importorskip("orjson")
+        else:
+            monkeypatch.setattr(bedrock_adapter, "orjson", None)
+
+        body = {"messages": [{"role": "user", "content": "Show loans in São Paulo"}]}
+        encoded = bedrock_adapter._json_dumps(body)
+        assert bedrock_adapter._json_loads(encoded) == body
+
+    def test_generate_sql_stream_error_event(self):
+        """Test Bedrock stream error events are reported as errors."""
+        adapter = BedrockAdapter({"enable": False})
+        adapter.model_id = "test-model"
+        adapter.client = MagicMock()
+        adapter.client.invoke_model_with_response_stream.return_value = {
+            "body": iter([{"throttlingException": {"message": "Too many requests"}}])
+        }
+
+        sql, error = adapter.generate_sql("prompt")
+
+        assert sql == ""
+        assert "throttlingException" in error
+
     def test_get_model_info(self):
         """Test get_model_info returns dict."""
         adapter = BedrockAdapter()
@@ -100,6 +192,71 @@ class TestClaudeAdapter:
         assert isinstance(info, dict)
         assert "provider" in info
 
+    def test_initialization_sends_no_request(self, mock_anthropic_client, monkeypatch):
+        """Test Claude initialization only builds the client; ping() is the explicit check."""
+        anthropic = pytest.importorskip("anthropic")
+        monkeypatch.setattr(anthropic, "Anthropic", MagicMock(return_value=mock_anthropic_client))
+
+        adapter = ClaudeAdapter({"api_key": "test-key"})
+        assert adapter.is_available()
+        mock_anthropic_client.messages.create.assert_not_called()
+
+        assert adapter.ping() == (True, "")
+        mock_anthropic_client.messages.create.assert_called_once()
+
+    def test_http_client_keeps_connections_alive(self, mock_anthropic_client, monkeypatch):
+        """Test the Anthropic client is given a tuned keep-alive HTTP client."""
+        anthropic = pytest.importorskip("anthropic")
+        client_factory = MagicMock(return_value=mock_anthropic_client)
+        monkeypatch.setattr(anthropic, "Anthropic", client_factory)
+
+        ClaudeAdapter({"api_key": "test-key"})
+
+        http_client = client_factory.call_args.kwargs["http_client"]
+        assert isinstance(http_client, anthropic.DefaultHttpxClient)
+        http_client.close()
+
+    def test_generate_sql_streams_tokens(self, mock_anthropic_client):
+        """Test Claude responses are streamed through the on_token callback."""
+        stream = MagicMock()
+        stream.text_stream = iter(["SELECT * ", "FROM data"])
+        mock_anthropic_client.messages.stream.return_value.__enter__.return_value = stream
+        adapter = ClaudeAdapter({"api_key": None})
+        adapter.api_key = "test-key"
+        adapter.client = mock_anthropic_client
+
+        tokens = []
+        sql, error = adapter.generate_sql("prompt", on_token=tokens.append)
+
+        assert (sql, error) == ("SELECT * FROM data", "")
+        assert tokens == ["SELECT * ", "FROM data"]
+
+    def test_generate_sql_marks_static_prefix_for_caching(self, mock_anthropic_client):
+        """Test the guidance and schema are sent as cacheable blocks ahead of the question."""
+        from src.prompts import SQL_GENERATION_GUIDANCE, build_sql_generation_prompt
+
+        stream = MagicMock()
+        stream.text_stream = iter(["SELECT 1"])
+        mock_anthropic_client.messages.stream.return_value.__enter__.return_value = stream
+        adapter = ClaudeAdapter({"api_key": None})
+        adapter.api_key = "test-key"
+        adapter.client = mock_anthropic_client
+
+        adapter.generate_sql(build_sql_generation_prompt("How many loans?", "CREATE TABLE t (a INT);"))
+
+        kwargs = mock_anthropic_client.messages.stream.call_args.kwargs
+        assert kwargs["system"] == [
+            {"type": "text", "text": SQL_GENERATION_GUIDANCE, "cache_control": {"type": "ephemeral"}}
+        ]
+        schema_block, question_block = kwargs["messages"][0]["content"]
+        assert schema_block == {
+            "type": "text",
+            "text": "Database Schema Context:\nCREATE TABLE t (a INT);",
+            "cache_control": {"type": "ephemeral"},
+        }
+        assert question_block["text"].startswith("User Question: How many loans?")
+        assert "cache_control" not in question_block
+
 
 class TestGeminiAdapter:
     """Test suite for GeminiAdapter."""
@@ -134,6 +291,160 @@ class TestGeminiAdapter:
         assert isinstance(info, dict)
         assert "provider" in info
 
+    def test_initialization_sends_no_request(self, monkeypatch):
+        """Test Gemini initialization only builds the model; ping() is the explicit check."""
+        fake_genai = MagicMock()
+        model = fake_genai.GenerativeModel.return_value
+        model.model_name = "models/gemini-1.5-pro"
+        monkeypatch.setattr(GeminiAdapter, "_genai_module", fake_genai)
+
+        adapter = GeminiAdapter({"api_key": "test-key"})
+        assert adapter.is_available()
+        model.generate_content.assert_not_called()
+
+        assert adapter.ping() == (True, "")
+        fake_genai.get_model.assert_called_once_with("models/gemini-1.5-pro")
+        model.generate_content.assert_not_called()
+
+    def test_generate_sql_streams_tokens(self):
+        """Test Gemini streams chunks to on_token and uses the aggregated text."""
+
+        class FakeStream:
+            text = "SELECT * FROM data"
+
+            def __iter__(self):
+                return iter([MagicMock(text="SELECT * "), MagicMock(text="FROM data")])
+
+        adapter = GeminiAdapter({"api_key": None})
+        adapter.api_key = "test-key"
+        adapter.model = MagicMock()
+        adapter.model.generate_content.return_value = FakeStream()
+
+        tokens = []
+        sql, error = adapter.generate_sql("prompt", on_token=tokens.append)
+
+        assert (sql, error) == ("SELECT * FROM data", "")
+        assert tokens == ["SELECT * ", "FROM data"]
+        adapter.model.generate_content.assert_called_once_with("prompt", stream=True)
+
+    def test_context_cache_sends_only_question(self, monkeypatch):
+        """Test the guidance and schema are cached server-side and stripped from requests."""
+        from src.ai_engines import gemini_adapter
+        from src.prompts import build_sql_generation_prompt
+
+        fake_genai = MagicMock()
+        cached_model = fake_genai.GenerativeModel.from_cached_content.return_value
+        cached_model.generate_content.return_value = MagicMock(text="SELECT 1")
+        monkeypatch.setattr(GeminiAdapter, "_genai_module", fake_genai)
+        monkeypatch.setattr(gemini_adapter, "CONTEXT_CACHE_ENABLED", True)
+
+        adapter = GeminiAdapter({"api_key": "test-key"})
+        prompt = build_sql_generation_prompt("How many loans?", "CREATE TABLE t (a INT);")
+        assert adapter.generate_sql(prompt) == ("SELECT 1", "")
+        assert adapter.generate_sql(prompt) == ("SELECT 1", "")
+
+        fake_genai.caching.CachedContent.create.assert_called_once()
+        create_kwargs = fake_genai.caching.CachedContent.create.call_args.kwargs
+        assert create_kwargs["contents"] == ["Database Schema Context:\nCREATE TABLE t (a INT);"]
+        sent = cached_model.generate_content.call_args.args[0]
+        assert sent.startswith("User Question: How many loans?")
+        assert "CREATE TABLE" not in sent
+        assert "LOAN PERFORMANCE DOMAIN EXPERTISE" not in sent
+
+        # A different schema gets its own cached content
+        adapter.generate_sql(build_sql_generation_prompt("How many loans?", "CREATE TABLE u (b INT);"))
+        assert fake_genai.caching.CachedContent.create.call_count == 2
+
+    def test_context_cache_failure_falls_back_to_full_prompt(self, monkeypatch):
+        """Test an unsupported cache (e.g. content below the minimum size) falls back once and for all."""
+        from src.ai_engines import gemini_adapter
+        from src.prompts import build_sql_generation_prompt
+
+        fake_genai = MagicMock()
+        fake_genai.caching.CachedContent.create.side_effect = RuntimeError("content too small")
+        model = fake_genai.GenerativeModel.return_value
+        model.generate_content.return_value = MagicMock(text="SELECT 1")
+        monkeypatch.setattr(GeminiAdapter, "_genai_module", fake_genai)
+        monkeypatch.setattr(gemini_adapter, "CONTEXT_CACHE_ENABLED", True)
+
+        adapter = GeminiAdapter({"api_key": "test-key"})
+        prompt = build_sql_generation_prompt("question", "CREATE TABLE t (a INT);")
+        adapter.generate_sql(prompt)
+        adapter.generate_sql(prompt)
+
+        fake_genai.caching.CachedContent.create.assert_called_once()
+        model.generate_content.assert_called_with(prompt, stream=False)
+
+    def test_genai_module_imported_once(self, monkeypatch):
+        """Test the google.generativeai module is resolved once and reused."""
+        from src.ai_engines import gemini_adapter
+
+        fake_genai = MagicMock()
+        import_module = MagicMock(return_value=fake_genai)
+        monkeypatch.setattr(gemini_adapter.importlib, "import_module", import_module)
+        monkeypatch.setattr(GeminiAdapter, "_genai_module", None)
+
+        assert GeminiAdapter._get_genai() is fake_genai
+        assert GeminiAdapter._get_genai() is fake_genai
+        import_module.assert_called_once_with("google.generativeai")
+
+    @pytest.mark.parametrize("use_orjson", [True, False])
+    def test_batch_results_map_back_to_request_order(self, monkeypatch, use_orjson):
+        """Test Batch API JSONL output is matched to prompts by key, not line order."""
+        from src.ai_engines import gemini_adapter
+
+        if use_orjson:
+            pytest.importorskip("orjson")
+        else:
+            monkeypatch.setattr(gemini_adapter, "orjson", None)
+        adapter = GeminiAdapter()
+        requests = [json.loads(line) for line in adapter._build_batch_requests(["q0", "q1", "q2"]).splitlines()]
+        assert [r["key"] for r in requests] == ["req_0", "req_1", "req_2"]
+        assert requests[1]["request"]["contents"][0]["parts"][0]["text"] == "q1"
+
+        def response(text):
+            return {"candidates": [{"content": {"parts": [{"text": text}]}}]}
+
+        output = "\n".join(
+            [
+                json.dumps({"key": "req_2", "response": response("```sql\nSELECT 2\n```")}),
+                json.dumps({"key": "req_0", "response": response("SELECT 0")}),
+                json.dumps({"key": "req_1", "error": {"message": "quota exceeded"}}),
+            ]
+        ).encode()
+
+        results = adapter._parse_batch_results(output, 3)
+
+        assert results[0] == ("SELECT 0", "")
+        assert results[1] == ("", "Gemini API error: quota exceeded")
+        assert results[2] == ("SELECT 2", "")
+
+
+class TestClassifyApiError:
+    """Test the shared provider error classifier."""
+
+    @pytest.mark.parametrize(
+        "message,expected",
+        [
+            ("Invalid API key provided", "auth"),
+            ("AccessDeniedException: access denied", "auth"),
+            ("ThrottlingException: Too many requests", "rate_limit"),
+            ("RateLimitError: quota exceeded", "rate_limit"),
+            ("Response blocked by safety filters", "safety"),
+            ("model not found", "model"),
+            # Earlier categories win regardless of where they appear in the text
+            ("model gemini-pro: quota exceeded", "rate_limit"),
+            # "rate" only matches at a word start, not inside "generated"
+            ("the generated output was empty", None),
+        ],
+    )
+    def test_categories(self, message, expected):
+        assert classify_api_error(message) == expected
+
+    def test_restricted_to_caller_categories(self):
+        """Test categories the caller has no hint for are skipped."""
+        assert classify_api_error("blocked: model overloaded", ["auth", "model"]) == "model"
+
 
 class TestAdapterValidation:
     """Test adapter validation methods."""
@@ -155,6 +466,19 @@ class TestAdapterValidation:
         is_valid, msg = adapter.validate_response("This is not SQL")
         assert is_valid is False
 
+        # Leading whitespace and mixed case
+        is_valid, msg = adapter.validate_response("  \n  With t AS (SELECT 1) SELECT * FROM t")
+        assert is_valid is True
+        assert msg == ""
+
+        # Destructive keywords produce a warning, column names containing them do not
+        is_valid, msg = adapter.validate_response("DELETE FROM table WHERE id = 1")
+        assert is_valid is True
+        assert "destructive" in msg
+        is_valid, msg = adapter.validate_response("SELECT is_deleted, dropdown_value FROM table")
+        assert is_valid is True
+        assert msg == ""
+
     def test_clean_sql_response(self):
         """Test clean_sql_response method."""
         adapter = BedrockAdapter()
@@ -166,7 +490,25 @@ class TestAdapterValidation:
         # SQL with prefix
         sql = adapter.clean_sql_response("Here's the SQL query: SELECT * FROM table")
         assert sql == "SELECT * FROM table"
+        sql = adapter.clean_sql_response("QUERY:\nSELECT * FROM table")
+        assert sql == "SELECT * FROM table"
 
         # Plain SQL
         sql = adapter.clean_sql_response("SELECT * FROM table")
         assert sql == "SELECT * FROM table"
+
+    def test_clean_sql_response_fence_variants(self):
+        """Test clean_sql_response handles untagged, uppercase and unterminated fences."""
+        adapter = BedrockAdapter()
+
+        # Explanation before an untagged fenced block
+        sql = adapter.clean_sql_response("Sure:\n```\nSELECT 1\n```\nThis returns one row.")
+        assert sql == "SELECT 1"
+
+        # Uppercase language tag
+        sql = adapter.clean_sql_response("```SQL\nWITH t AS (SELECT 1) SELECT * FROM t\n```")
+        assert sql == "WITH t AS (SELECT 1) SELECT * FROM t"
+
+        # Truncated response without a closing fence
+        sql = adapter.clean_sql_response("```sql\nSELECT * FROM table")
+        assert sql == "SELECT * FROM table"
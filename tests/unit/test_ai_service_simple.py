@@ -2,7 +2,20 @@
 Unit tests for AIService
 """
 
-from src.ai_service import AIService, generate_sql_with_ai, get_ai_service, initialize_ai_client
+import asyncio
+import threading
+from unittest.mock import MagicMock
+
+from src import ai_service
+from src.ai_service import (
+    AIService,
+    DiskPromptCache,
+    EmbeddingCache,
+    PromptCache,
+    generate_sql_with_ai,
+    get_ai_service,
+    initialize_ai_client,
+)
 
 
 class TestAIService:
@@ -16,6 +29,103 @@ class TestAIService:
         assert "claude" in service.adapters
         assert "gemini" in service.adapters
 
+    def test_only_configured_provider_is_constructed(self, monkeypatch):
+        """Test adapters are built lazily, starting with the configured provider."""
+        built = []
+
+        def fake_load(provider_id):
+            built.append(provider_id)
+            adapter = MagicMock()
+            adapter.is_available.return_value = True
+            return adapter
+
+        monkeypatch.setattr("src.ai_service._load_adapter", fake_load)
+        monkeypatch.setattr("src.ai_service._sdk_installed", lambda provider_id: True)
+        monkeypatch.setattr("src.ai_service.AI_PROVIDER", "gemini")
+        monkeypatch.setenv("CLAUDE_API_KEY", "test-key")
+        for name in ai_service.PROVIDER_INFO["bedrock"][1]:
+            monkeypatch.delenv(name, raising=False)
+
+        service = AIService()
+
+        assert service.get_active_provider() == "gemini"
+        assert built == ["gemini"]
+        assert list(service.adapters) == ["bedrock", "claude", "gemini"]
+        assert not service.adapters.is_loaded("bedrock")
+
+        # Claude has a key but is not built yet; Bedrock has no credentials
+        assert service.get_provider_status() == {"active": "gemini", "bedrock": False, "claude": None, "gemini": True}
+        assert list(service.get_available_providers()) == ["claude", "gemini"]
+        assert service.get_available_providers()["claude"] == "Claude API"
+        assert built == ["gemini"]
+
+        # Selecting a configured provider builds its adapter
+        assert service.set_active_provider("claude") is True
+        assert built == ["gemini", "claude"]
+        assert service.get_provider_status()["claude"] is True
+
+    def test_fallback_providers_probed_concurrently(self, monkeypatch):
+        """Test fallback adapters are constructed in parallel when the configured one is unavailable."""
+        barrier = threading.Barrier(3, timeout=5)
+
+        def fake_load(provider_id):
+            # Each constructor waits for the others, so this only completes if they run concurrently
+            barrier.wait()
+            adapter = MagicMock()
+            adapter.is_available.return_value = provider_id == "gemini"
+            return adapter
+
+        monkeypatch.setattr("src.ai_service._load_adapter", fake_load)
+        monkeypatch.setattr("src.ai_service._sdk_installed", lambda provider_id: True)
+        monkeypatch.setattr("src.ai_service.AI_PROVIDER", "auto")
+
+        service = AIService()
+
+        assert service.get_active_provider() == "gemini"
+
+    def test_providers_enabled_limits_candidates(self, monkeypatch):
+        """Test AI_PROVIDERS_ENABLED restricts fallback; other providers load only when selected."""
+        built = []
+
+        def fake_load(provider_id):
+            built.append(provider_id)
+            adapter = MagicMock()
+            adapter.is_available.return_value = provider_id != "bedrock"
+            return adapter
+
+        monkeypatch.setattr("src.ai_service._load_adapter", fake_load)
+        monkeypatch.setattr("src.ai_service._sdk_installed", lambda provider_id: True)
+        monkeypatch.setattr("src.ai_service.AI_PROVIDER", "bedrock")
+        monkeypatch.setattr("src.ai_service.AI_PROVIDERS_ENABLED", ["bedrock", "claude"])
+
+        service = AIService()
+        assert service.get_active_provider() == "claude"
+        assert list(service.get_provider_status()) == ["active", "bedrock", "claude"]
+        assert "gemini" not in built
+
+        assert service.set_active_provider("gemini") is True
+        assert service.get_active_provider() == "gemini"
+
+    def test_failing_adapter_does_not_block_others(self, monkeypatch):
+        """Test a provider whose adapter raises on construction is skipped, not fatal."""
+
+        def fake_load(provider_id):
+            if provider_id == "bedrock":
+                raise RuntimeError("broken SDK")
+            adapter = MagicMock()
+            adapter.is_available.return_value = provider_id == "claude"
+            return adapter
+
+        monkeypatch.setattr("src.ai_service._load_adapter", fake_load)
+        monkeypatch.setattr("src.ai_service._sdk_installed", lambda provider_id: True)
+        monkeypatch.setattr("src.ai_service.AI_PROVIDER", "bedrock")
+
+        service = AIService()
+
+        assert service.get_active_provider() == "claude"
+        assert service.get_provider_status() == {"active": "claude", "bedrock": False, "claude": True, "gemini": False}
+        assert service.set_active_provider("bedrock") is False
+
     def test_is_available(self):
         """Test is_available returns boolean."""
         service = AIService()
@@ -50,6 +160,338 @@ class TestAIService:
         assert isinstance(error, str)
         assert isinstance(provider, str)
 
+    def test_active_adapter_follows_active_provider(self):
+        """Test the active adapter is resolved when the provider changes, not per request."""
+        service = AIService()
+        adapter = MagicMock()
+        service.adapters["claude"] = adapter
+
+        service.active_provider = "claude"
+        assert service.get_active_adapter() is adapter
+
+        service.active_provider = None
+        assert service.get_active_adapter() is None
+
+    def test_prompt_hash_ignores_formatting_and_comments(self):
+        """Test the cache key depends on question text and schema structure only."""
+        service = AIService()
+        service.active_provider = "claude"
+        key = service._create_prompt_hash("How many loans?", "CREATE TABLE t (\n  a INT\n);")
+
+        assert len(key) == 32
+        assert key == service._create_prompt_hash("  how many   LOANS? ", "-- loans\nCREATE TABLE t (\n    a INT\n);")
+        assert key != service._create_prompt_hash("How many loans?", "CREATE TABLE t (\n  b INT\n);")
+
+        service.active_provider = "gemini"
+        assert key != service._create_prompt_hash("How many loans?", "CREATE TABLE t (\n  a INT\n);")
+
+    def test_schema_digest_memoized_and_bounded(self, monkeypatch):
+        """Test each schema is scanned once and only a few digests are kept."""
+        service = AIService()
+        schema = "CREATE TABLE t (a INT);"
+        first = service._schema_digest(schema)
+
+        monkeypatch.setattr("src.ai_service.hashlib.blake2b", MagicMock(side_effect=AssertionError("rehashed")))
+        assert service._schema_digest(schema) == first
+        monkeypatch.undo()
+
+        for i in range(20):
+            service._schema_digest(f"CREATE TABLE t{i} (a INT);")
+        assert len(service._schema_digests) == 8
+        assert schema not in service._schema_digests
+
+    def test_build_sql_prompt_layout(self):
+        """Test the prompt places the static guidance first, then schema, then question."""
+        from src.prompts import SQL_GENERATION_GUIDANCE
+
+        prompt = AIService._build_sql_prompt("How many loans?", "CREATE TABLE t (a INT);")
+
+        assert prompt.startswith(SQL_GENERATION_GUIDANCE)
+        assert "Database Schema Context:\nCREATE TABLE t (a INT);\n\nUser Question: How many loans?\n\n" in prompt
+        assert prompt.index("LOAN PERFORMANCE DOMAIN EXPERTISE:") < prompt.index("Database Schema Context:")
+        assert prompt.endswith("Write ONLY the SQL query - no explanations:")
+
+    def test_generate_sql_batch_dispatches_concurrently(self):
+        """Test generate_sql_batch runs adapter requests together and keeps input order."""
+        service = AIService()
+        in_flight = []
+
+        async def fake_generate(prompt):
+            in_flight.append(prompt)
+            await asyncio.sleep(0.01)
+            # Every request was started before any of them finished
+            assert len(in_flight) == 3
+            return f"SELECT {prompt.count('Q')}", ""
+
+        adapter = MagicMock()
+        adapter.generate_sql_async.side_effect = fake_generate
+        service.adapters["claude"] = adapter
+        service.active_provider = "claude"
+        service._build_sql_prompt = lambda question, schema: question
+
+        results = asyncio.run(service.generate_sql_batch([("Q", "s"), ("QQ", "s"), ("QQQ", "s")]))
+
+        assert results == [("SELECT 1", "", "claude"), ("SELECT 2", "", "claude"), ("SELECT 3", "", "claude")]
+
+    def test_generate_sql_batch_without_provider(self):
+        """Test generate_sql_batch reports an error per question when no provider is available."""
+        service = AIService()
+        service.active_provider = None
+
+        results = asyncio.run(service.generate_sql_batch([("q1", "s"), ("q2", "s")]))
+
+        assert results == [("", "No AI adapter available", "none")] * 2
+
+
+class TestPromptCache:
+    """Test suite for the shared prompt cache."""
+
+    def test_generate_sql_served_from_cache(self, monkeypatch):
+        """Test a repeated question is answered without calling the adapter again."""
+        monkeypatch.setattr("src.ai_service.ENABLE_PROMPT_CACHE", True)
+        service = AIService()
+        adapter = MagicMock()
+        adapter.generate_sql.return_value = ("SELECT 1", "")
+        adapter.validate_response.return_value = (True, "")
+        service.adapters["claude"] = adapter
+        service.active_provider = "claude"
+
+        first = service.generate_sql("How many loans?", "CREATE TABLE t (a INT);")
+        second = service.generate_sql("how many   loans?", "CREATE TABLE t (a INT);")
+
+        assert first == ("SELECT 1", "", "claude")
+        assert second == ("SELECT 1", "", "claude (cached)")
+        assert adapter.generate_sql.call_count == 1
+
+    def test_lru_eviction(self):
+        """Test the least recently used entry is evicted when full."""
+        cache = PromptCache(max_entries=2, ttl=60)
+        cache.set("a", "SELECT 'a'")
+        cache.set("b", "SELECT 'b'")
+        assert cache.get("a") == "SELECT 'a'"
+
+        cache.set("c", "SELECT 'c'")
+
+        assert cache.get("b") is None
+        assert cache.get("a") == "SELECT 'a'"
+        assert len(cache) == 2
+
+    def test_ttl_expiry(self, monkeypatch):
+        """Test entries expire after the TTL."""
+        now = [1000.0]
+        monkeypatch.setattr("src.ai_service.time.monotonic", lambda: now[0])
+        cache = PromptCache(max_entries=10, ttl=60)
+        cache.set("a", "SELECT 1")
+
+        now[0] += 61
+
+        assert cache.get("a") is None
+        assert len(cache) == 0
+
+    def test_disk_cache_survives_restart(self, monkeypatch, tmp_path):
+        """Test SQL stored by one service instance is served to a fresh one from the SQLite tier."""
+        monkeypatch.setattr("src.ai_service.ENABLE_PROMPT_CACHE", True)
+        monkeypatch.setattr("src.ai_service.PROMPT_CACHE_DB", str(tmp_path / "prompt_cache.db"))
+        adapter = MagicMock()
+        adapter.generate_sql.return_value = ("SELECT 1", "")
+        adapter.validate_response.return_value = (True, "")
+
+        services = [AIService(), AIService()]
+        for service in services:
+            service.adapters["claude"] = adapter
+            service.active_provider = "claude"
+
+        assert services[0].generate_sql("How many loans?", "CREATE TABLE t (a INT);") == ("SELECT 1", "", "claude")
+        services[0]._disk_cache.flush()
+        assert services[1].generate_sql("How many loans?", "CREATE TABLE t (a INT);") == (
+            "SELECT 1",
+            "",
+            "claude (cached)",
+        )
+        assert adapter.generate_sql.call_count == 1
+
+    def test_disk_cache_ttl_expiry(self, monkeypatch, tmp_path):
+        """Test persisted entries expire after the TTL."""
+        now = [1000.0]
+        monkeypatch.setattr("src.ai_service.time.time", lambda: now[0])
+        cache = DiskPromptCache(str(tmp_path / "prompt_cache.db"), ttl=60)
+        cache.set("a", "SELECT 1")
+        cache.flush()
+        assert cache.get("a") == "SELECT 1"
+
+        now[0] += 61
+
+        assert cache.get("a") is None
+
+    def test_disk_cache_close_flushes_and_stops_writer(self, tmp_path):
+        """Test close() stores queued writes, joins the writer thread and ignores later use."""
+        path = str(tmp_path / "prompt_cache.db")
+        cache = DiskPromptCache(path, ttl=60)
+        cache.set("a", "SELECT 1")
+        cache.close()
+        cache.close()
+
+        assert not cache._writer.is_alive()
+        cache.set("b", "SELECT 2")
+        assert cache.get("a") is None
+        assert DiskPromptCache(path, ttl=60).get("a") == "SELECT 1"
+
+    def test_clearing_service_closes_disk_cache(self, monkeypatch, tmp_path):
+        """Test the replaced or cleared singleton releases its disk cache."""
+        monkeypatch.setattr("src.ai_service.ENABLE_PROMPT_CACHE", True)
+        monkeypatch.setattr("src.ai_service.PROMPT_CACHE_DB", str(tmp_path / "prompt_cache.db"))
+        get_ai_service.clear()
+        first = get_ai_service()
+        second = get_ai_service(-1)
+        assert not first._disk_cache._writer.is_alive()
+
+        get_ai_service.clear()
+        assert not second._disk_cache._writer.is_alive()
+
+
+class TestSingleFlight:
+    """Test coalescing of identical concurrent requests."""
+
+    def test_concurrent_identical_requests_share_one_call(self, monkeypatch):
+        """Test a second identical request waits for the first instead of calling the provider."""
+        monkeypatch.setattr("src.ai_service.ENABLE_PROMPT_CACHE", False)
+        service = AIService()
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_generate(prompt, on_token=None):
+            started.set()
+            release.wait(5)
+            return "SELECT 1", ""
+
+        adapter = MagicMock()
+        adapter.generate_sql.side_effect = slow_generate
+        service.adapters["claude"] = adapter
+        service.active_provider = "claude"
+
+        joined = threading.Event()
+
+        class WatchedInflight(dict):
+            def get(self, key, default=None):
+                future = super().get(key, default)
+                if future is not None:
+                    joined.set()
+                return future
+
+        service._inflight = WatchedInflight()
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(service.generate_sql("q", "schema")))
+        leader.start()
+        assert started.wait(5)
+
+        follower = threading.Thread(target=lambda: results.append(service.generate_sql("q", "schema")))
+        follower.start()
+        # Release the leader only once the follower has picked up the in-flight request
+        assert joined.wait(5)
+        release.set()
+        leader.join(5)
+        follower.join(5)
+
+        assert results == [("SELECT 1", "", "claude")] * 2
+        assert adapter.generate_sql.call_count == 1
+        assert service._inflight == {}
+
+
+class TestEmbeddingCache:
+    """Test suite for the semantic cache."""
+
+    def test_similar_question_hits_on_same_schema_only(self):
+        """Test lookups match by cosine similarity and never across schemas."""
+        cache = EmbeddingCache(threshold=0.95, max_entries=4)
+        cache.add([1.0, 0.0, 0.0], "schema-a", "SELECT 'a'")
+        cache.add([0.0, 1.0, 0.0], "schema-b", "SELECT 'b'")
+
+        assert cache.lookup([0.99, 0.05, 0.0], "schema-a") == "SELECT 'a'"
+        assert cache.lookup([0.99, 0.05, 0.0], "schema-b") is None
+        assert cache.lookup([0.6, 0.8, 0.0], "schema-a") is None
+        assert cache.lookup([1.0, 0.0, 0.0], "unknown") is None
+
+    def test_oldest_entry_overwritten_when_full(self):
+        """Test the cache keeps a fixed number of entries."""
+        cache = EmbeddingCache(threshold=0.95, max_entries=2)
+        cache.add([1.0, 0.0], "s", "SELECT 1")
+        cache.add([0.0, 1.0], "s", "SELECT 2")
+        cache.add([-1.0, 0.0], "s", "SELECT 3")
+
+        assert len(cache) == 2
+        assert cache.lookup([1.0, 0.0], "s") is None
+        assert cache.lookup([-1.0, 0.0], "s") == "SELECT 3"
+
+    def test_schema_keys_bounded_with_entries(self):
+        """Test schema keys whose entries were all overwritten are dropped."""
+        cache = EmbeddingCache(threshold=0.95, max_entries=2)
+        for i in range(10):
+            cache.add([1.0, float(i)], f"schema-{i}", f"SELECT {i}")
+
+        assert len(cache._schema_keys) <= cache.max_entries + 1
+        assert cache.lookup([1.0, 9.0], "schema-9") == "SELECT 9"
+        assert cache.lookup([1.0, 0.0], "schema-0") is None
+
+    def test_generate_sql_uses_semantic_match(self, monkeypatch):
+        """Test a rephrased question is served from the semantic cache."""
+        monkeypatch.setattr("src.ai_service.ENABLE_SEMANTIC_CACHE", True)
+        service = AIService()
+        adapter = MagicMock()
+        adapter.generate_sql.return_value = ("SELECT 1", "")
+        adapter.validate_response.return_value = (True, "")
+        service.adapters["claude"] = adapter
+        service.active_provider = "claude"
+        service._embed_questions = lambda questions: [[1.0, 0.02 * len(questions[0])]]
+
+        service.generate_sql("top 10 loans by UPB", "schema")
+        result = service.generate_sql("show me the 10 biggest loans by UPB", "schema")
+
+        assert result == ("SELECT 1", "", "claude (semantic-cached)")
+        assert adapter.generate_sql.call_count == 1
+
+    def test_local_embedder_preferred_over_gemini(self, monkeypatch):
+        """Test fastembed embeddings are used, without touching the Gemini adapter, when installed."""
+        embedder = MagicMock()
+        embedder.embed.return_value = iter([[1.0, 0.0], [0.0, 1.0]])
+        monkeypatch.setattr("src.ai_service._get_local_embedder", lambda: embedder)
+        service = AIService()
+        gemini = MagicMock()
+        service.adapters["gemini"] = gemini
+        service.active_provider = "claude"
+
+        added = service.warm_semantic_cache([("q1", "schema", "SELECT 1"), ("q2", "schema", "SELECT 2")])
+
+        assert added == 2
+        embedder.embed.assert_called_once_with(["q1", "q2"])
+        gemini.embed_texts.assert_not_called()
+        assert service._semantic_cache.lookup([0.0, 1.0], service._semantic_schema_key("schema")) == "SELECT 2"
+
+    def test_gemini_build_failure_skips_semantic_tier(self, monkeypatch):
+        """Test a Gemini adapter that cannot be built disables semantic caching instead of failing generate_sql."""
+        monkeypatch.setattr("src.ai_service.ENABLE_SEMANTIC_CACHE", True)
+        monkeypatch.setattr("src.ai_service._get_local_embedder", lambda: None)
+        builds = []
+
+        def fake_load(provider_id):
+            builds.append(provider_id)
+            raise RuntimeError("broken SDK")
+
+        monkeypatch.setattr("src.ai_service._load_adapter", fake_load)
+        # No fallback probing at startup, so the first semantic lookup is what builds Gemini
+        monkeypatch.setattr("src.ai_service._sdk_installed", lambda provider_id: False)
+        monkeypatch.setattr("src.ai_service.AI_PROVIDER", "claude")
+        service = AIService()
+        adapter = MagicMock()
+        adapter.generate_sql.return_value = ("SELECT 1", "")
+        adapter.validate_response.return_value = (True, "")
+        service.adapters["claude"] = adapter
+        service.active_provider = "claude"
+
+        assert service.generate_sql("q1", "schema") == ("SELECT 1", "", "claude")
+        assert service.generate_sql("q2", "schema") == ("SELECT 1", "", "claude")
+        assert builds.count("gemini") == 1
+
 
 class TestGlobalFunctions:
     """Test suite for global convenience functions."""
@@ -63,9 +505,15 @@ class TestGlobalFunctions:
         """Test that get_ai_service returns same instance."""
         service1 = get_ai_service()
         service2 = get_ai_service()
-        # Due to Streamlit caching, should be same instance
-        assert isinstance(service1, AIService)
-        assert isinstance(service2, AIService)
+        assert service1 is service2
+
+    def test_get_ai_service_replaced_on_version_change(self):
+        """Test a different cache_version builds a new service that is then reused."""
+        service1 = get_ai_service()
+        service2 = get_ai_service(-1)
+        assert service2 is not service1
+        assert get_ai_service(-1) is service2
+        get_ai_service.clear()
 
     def test_initialize_ai_client(self):
         """Test initialize_ai_client returns tuple."""
@@ -78,6 +526,14 @@ class TestGlobalFunctions:
         assert service is None or isinstance(service, AIService)
         assert isinstance(provider, str)
 
+    def test_services_module_reuses_single_service(self):
+        """Test the UI-facing services module re-exports the one AIService, not a copy."""
+        from src import ai_service
+        from src.services import ai_service as services_ai_service
+
+        assert services_ai_service.AIService is ai_service.AIService
+        assert services_ai_service.get_ai_service is ai_service.get_ai_service
+
     def test_generate_sql_with_ai(self, sample_question, sample_schema):
         """Test generate_sql_with_ai convenience function."""
         result = generate_sql_with_ai(sample_question, sample_schema)
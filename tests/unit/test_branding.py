@@ -1,5 +1,5 @@
-import base64
 from pathlib import Path
+from urllib.parse import unquote
 
 from src.branding import get_favicon_path, get_logo_data_uri, get_logo_path, get_logo_svg
 
@@ -18,14 +18,14 @@ def test_get_logo_svg_and_data_uri_consistency():
         assert get_logo_data_uri() is None
         return
 
-    # If SVG exists, data URI should be a valid base64-encoded string
+    # If SVG exists, data URI should be a percent-encoded copy of the markup
     data_uri = get_logo_data_uri()
     assert data_uri is not None
-    assert data_uri.startswith("data:image/svg+xml;base64,")
+    assert data_uri.startswith("data:image/svg+xml;charset=utf-8,")
     encoded = data_uri.split(",", 1)[1]
-    # Ensure base64 decodes without error
-    decoded = base64.b64decode(encoded)
-    assert len(decoded) > 0
+    # Characters that would break a quoted src attribute stay escaped
+    assert not any(ch in encoded for ch in "'\"<>#\n")
+    assert unquote(encoded) == " ".join(svg.split())
 
 
 def test_get_favicon_path_optional():
@@ -0,0 +1,165 @@
+"""
+Unit tests for core data helpers
+"""
+
+import duckdb
+import pytest
+
+from src import core
+
+
+@pytest.fixture
+def parquet_files(tmp_path):
+    """Two small parquet files, each exposed as a table named after the file."""
+    paths = []
+    with duckdb.connect() as conn:
+        for name, rows in (("loans", 3), ("states", 2)):
+            path = tmp_path / f"{name}.parquet"
+            conn.execute(f"COPY (SELECT range AS id, 'x' || range AS label FROM range({rows})) TO '{path}'")
+            paths.append(str(path))
+    return paths
+
+
+def test_execute_sql_query_reuses_connection(parquet_files):
+    """Test queries run against views on one cached connection per file set."""
+    core.get_duckdb_connection.clear()
+
+    first = core.execute_sql_query("SELECT COUNT(*) AS n FROM loans", parquet_files)
+    second = core.execute_sql_query("SELECT MAX(id) AS m FROM states", parquet_files)
+
+    assert first["n"].tolist() == [3]
+    assert second["m"].tolist() == [1]
+    fingerprint = core.fingerprint_files(parquet_files)
+    assert core.get_duckdb_connection(fingerprint) is core.get_duckdb_connection(fingerprint)
+
+
+def test_execute_sql_query_error_returns_empty(parquet_files):
+    """Test a failing query yields an empty DataFrame instead of raising."""
+    assert core.execute_sql_query("SELECT * FROM missing_table", parquet_files).empty
+
+
+def test_sync_data_checks_once_per_process(parquet_files, monkeypatch):
+    """Test local data is validated once; later calls skip DuckDB and the sync subprocess."""
+    monkeypatch.setattr(core, "PROCESSED_DATA_DIR", core.Path(parquet_files[0]).parent)
+    monkeypatch.setattr(core, "_data_verified", False)
+    calls = []
+    real_connect = duckdb.connect
+    monkeypatch.setattr(duckdb, "connect", lambda *a, **k: calls.append(a) or real_connect(*a, **k))
+
+    assert core.sync_data_if_needed() is True
+    assert core.sync_data_if_needed() is True
+    assert len(calls) == 1
+
+
+def test_list_parquet_files_filters_and_handles_missing_dir(parquet_files, tmp_path, monkeypatch):
+    """Test only regular .parquet files are listed and a missing directory yields []."""
+    (tmp_path / "notes.txt").write_text("x")
+    (tmp_path / "nested.parquet").mkdir()
+    monkeypatch.setattr(core, "PROCESSED_DATA_DIR", tmp_path)
+    assert [str(path) for path in core._list_parquet_files()] == sorted(parquet_files)
+
+    monkeypatch.setattr(core, "PROCESSED_DATA_DIR", tmp_path / "missing")
+    assert core._list_parquet_files() == []
+
+
+def test_get_basic_table_schemas_batches_files(parquet_files):
+    """Test every file's CREATE TABLE comes from one batched DESCRIBE, columns in order."""
+    schema = core.get_basic_table_schemas(parquet_files)
+
+    assert schema == (
+        "CREATE TABLE loans (\n    id BIGINT,\n    label VARCHAR\n);\n\n"
+        "CREATE TABLE states (\n    id BIGINT,\n    label VARCHAR\n);"
+    )
+
+
+def test_get_table_schemas_rebuilds_only_when_files_change(parquet_files, monkeypatch):
+    """Test the schema cache is keyed on file mtime/size rather than the list object or a TTL."""
+    core._build_table_schemas.clear()
+    calls = []
+    monkeypatch.setattr(core, "build_schema_context_from_parquet", None)
+    monkeypatch.setattr(
+        core,
+        "generate_enhanced_schema_context",
+        lambda files: calls.append(files) or core.get_basic_table_schemas(files),
+    )
+
+    first = core.get_table_schemas(list(parquet_files))
+    assert core.get_table_schemas(list(parquet_files)) == first
+    assert len(calls) == 1
+
+    with duckdb.connect() as conn:
+        conn.execute(f"COPY (SELECT 1 AS id, 2.5 AS rate) TO '{parquet_files[0]}'")
+    assert "rate" in core.get_table_schemas(list(parquet_files))
+    assert len(calls) == 2
+
+
+def test_scan_parquet_files_skips_invalid_files(parquet_files, tmp_path, monkeypatch):
+    """Test footer validation drops files that are not parquet and keeps the rest."""
+    (tmp_path / "broken.parquet").write_text("not a parquet file")
+    monkeypatch.setattr(core, "PROCESSED_DATA_DIR", tmp_path)
+    monkeypatch.setattr(core, "_data_verified", True)
+    core.scan_parquet_files.clear()
+
+    assert core.scan_parquet_files() == sorted(parquet_files)
+
+
+def test_execute_sql_query_handles_quotes_in_file_names(tmp_path):
+    """Test view registration quotes file names instead of splicing them into SQL."""
+    path = tmp_path / "it's.parquet"
+    escaped = str(path).replace("'", "''")
+    with duckdb.connect() as conn:
+        conn.execute(f"COPY (SELECT 42 AS answer) TO '{escaped}'")
+    core.get_duckdb_connection.clear()
+
+    result = core.execute_sql_query('SELECT answer FROM "it\'s"', [str(path)])
+
+    assert result["answer"].tolist() == [42]
+    assert "answer INTEGER" in core.get_basic_table_schemas([str(path)])
+
+
+def test_validate_schema_context_checks_shape_without_executing():
+    """Test commented (non-executable) CREATE TABLE context is accepted and prose is rejected."""
+    annotated = "CREATE TABLE loans (\n    LOAN_ID VARCHAR -- Unique loan id | Identification\n);"
+
+    assert core.validate_schema_context(annotated)
+    assert not core.validate_schema_context("-- Error generating schema: boom")
+    assert not core.validate_schema_context("   ")
+
+
+def test_partitioned_files_are_queried_as_one_table(tmp_path, monkeypatch):
+    """Test data_2020Q1/data_2020Q2 become one 'data' view and one CREATE TABLE when opted in."""
+    monkeypatch.setenv("COMBINE_PARTITIONED_TABLES", "true")
+    files = []
+    with duckdb.connect() as conn:
+        for quarter, rows in (("2020Q1", 2), ("2020Q2", 3)):
+            path = tmp_path / f"data_{quarter}.parquet"
+            conn.execute(f"COPY (SELECT range AS id FROM range({rows})) TO '{path}'")
+            files.append(str(path))
+    core.get_duckdb_connection.clear()
+
+    assert core.group_parquet_tables(files) == {"data": files}
+    assert core.execute_sql_query("SELECT COUNT(*) AS n FROM data", files)["n"].tolist() == [5]
+    assert core.get_basic_table_schemas(files) == "CREATE TABLE data (\n    id BIGINT\n);"
+
+
+def test_partition_suffixes_stay_separate_tables_by_default(monkeypatch):
+    """Test files like sales_2020/sales_2021 keep a table per file unless grouping is enabled."""
+    monkeypatch.delenv("COMBINE_PARTITIONED_TABLES", raising=False)
+    files = ["/data/sales_2020.parquet", "/data/sales_2021.parquet"]
+
+    assert list(core.group_parquet_tables(files)) == ["sales_2020", "sales_2021"]
+    assert core.group_parquet_tables(files, combine_partitions=True) == {"sales": files}
+
+
+def test_sync_runs_in_process_when_data_missing(tmp_path, monkeypatch):
+    """Test a missing data directory triggers src.sync.sync directly, passing force through."""
+    import src.sync
+
+    calls = []
+    monkeypatch.setattr(core, "PROCESSED_DATA_DIR", tmp_path / "missing")
+    monkeypatch.setattr(core, "_data_verified", False)
+    monkeypatch.setattr(src.sync, "sync", lambda force=False: calls.append(force) or True)
+
+    assert core.sync_data_if_needed() is True
+    assert core.sync_data_if_needed(force=True) is True
+    assert calls == [False, True]
@@ -0,0 +1,41 @@
+"""
+Unit tests for the D1 activity logger
+"""
+
+import threading
+
+from src import d1_logger
+from src.d1_logger import D1Logger
+
+
+def test_disabled_logger_skips_requests(monkeypatch):
+    """Test no executor is created and nothing is posted without credentials."""
+    monkeypatch.delenv("CLOUDFLARE_API_TOKEN", raising=False)
+    logger = D1Logger()
+
+    assert logger._executor is None
+    assert logger._submit_query("SELECT 1") is None
+
+
+def test_log_user_query_does_not_block_caller(monkeypatch):
+    """Test query logging returns before the D1 request completes."""
+    monkeypatch.setenv("CLOUDFLARE_ACCOUNT_ID", "account")
+    monkeypatch.setenv("CLOUDFLARE_D1_DATABASE_ID", "db")
+    monkeypatch.setenv("CLOUDFLARE_API_TOKEN", "token")
+    release = threading.Event()
+    posted = []
+
+    def slow_post(url, headers=None, json=None):
+        release.wait(5)
+        posted.append(json)
+        raise ConnectionError("offline")
+
+    monkeypatch.setattr(d1_logger.requests, "post", slow_post)
+    logger = D1Logger()
+
+    logger.log_user_query("u1", "u1@example.com", "How many loans?", "SELECT 1", "claude", 0.5)
+    assert posted == []
+
+    release.set()
+    logger._executor.shutdown(wait=True)
+    assert posted[0]["params"][:3] == ["u1", "u1@example.com", "How many loans?"]
@@ -0,0 +1,41 @@
+"""
+Unit tests for the ontological schema context builder
+"""
+
+import duckdb
+
+from src import data_dictionary
+from src.data_dictionary import generate_enhanced_schema_context, get_parquet_columns
+
+
+def test_get_parquet_columns_describes_only_changed_files(tmp_path, monkeypatch):
+    """Test column lists are cached per (path, size, mtime) and refreshed when a file changes."""
+    path = tmp_path / "loans.parquet"
+    with duckdb.connect() as conn:
+        conn.execute(f"COPY (SELECT 1 AS LOAN_ID, 'CA' AS STATE) TO '{path}'")
+    monkeypatch.setattr(data_dictionary, "_FILE_COLUMNS_CACHE", {})
+    connects = []
+    real_connect = duckdb.connect
+    monkeypatch.setattr(duckdb, "connect", lambda *a, **k: connects.append(a) or real_connect(*a, **k))
+
+    assert get_parquet_columns([str(path)]) == [[("LOAN_ID", "INTEGER"), ("STATE", "VARCHAR")]]
+    assert get_parquet_columns([str(path)]) == [[("LOAN_ID", "INTEGER"), ("STATE", "VARCHAR")]]
+    assert len(connects) == 1
+
+    with real_connect() as conn:
+        conn.execute(f"COPY (SELECT 1 AS LOAN_ID, 'CA' AS STATE, 700 AS CSCORE_B) TO '{path}'")
+    assert get_parquet_columns([str(path)])[0][-1] == ("CSCORE_B", "INTEGER")
+    assert len(connects) == 2
+
+
+def test_generate_enhanced_schema_context_groups_known_and_other_fields(tmp_path):
+    """Test ontology fields carry their descriptions and unknown columns land under OTHER FIELDS."""
+    path = tmp_path / "loans.parquet"
+    with duckdb.connect() as conn:
+        conn.execute(f"COPY (SELECT 'L1' AS LOAN_ID, 1 AS MYSTERY_FLAG) TO '{path}'")
+
+    context = generate_enhanced_schema_context([str(path)])
+
+    assert "CREATE TABLE loans (" in context
+    assert "    LOAN_ID VARCHAR -- " in context
+    assert "    -- OTHER FIELDS:\n    MYSTERY_FLAG INTEGER -- Mystery Flag" in context
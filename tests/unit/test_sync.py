@@ -0,0 +1,87 @@
+"""
+Unit tests for the R2 data sync
+"""
+
+import hashlib
+
+import pytest
+
+from src import sync
+
+CONTENT = {"loans.parquet": b"PAR1 loans PAR1", "states.parquet": b"PAR1 states PAR1"}
+
+
+class FakeR2Client:
+    """In-memory stand-in for the boto3 S3 client, recording every GET."""
+
+    def __init__(self, content):
+        self.content = content
+        self.downloads = []
+
+    def get_paginator(self, operation):
+        return self
+
+    def paginate(self, **kwargs):
+        contents = [
+            {"Key": key, "Size": len(body), "LastModified": None, "ETag": f'"{hashlib.md5(body).hexdigest()}"'}
+            for key, body in self.content.items()
+        ]
+        return [{"Contents": contents}]
+
+    def download_file(self, bucket, key, local_path):
+        self.downloads.append(key)
+        with open(local_path, "wb") as f:
+            f.write(self.content[key])
+
+
+@pytest.fixture
+def r2(tmp_path, monkeypatch):
+    """Point the sync at a temp directory and a fake bucket; listings are never trusted from the TTL."""
+    client = FakeR2Client(dict(CONTENT))
+    monkeypatch.setattr(sync, "LOCAL_DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(sync, "MANIFEST_PATH", str(tmp_path / ".r2_manifest.json"))
+    monkeypatch.setattr(sync, "SYNC_TTL", 0)
+    monkeypatch.setattr(sync, "FORCE_REFRESH", False)
+    monkeypatch.setattr(sync, "create_r2_client", lambda: client)
+    return client
+
+
+def test_refresh_skips_files_with_unchanged_etags(r2):
+    """Test a --force refresh after a full sync lists R2 but downloads nothing."""
+    assert sync.sync() is True
+    assert sorted(r2.downloads) == sorted(CONTENT)
+
+    r2.downloads.clear()
+    assert sync.sync(force=True) is True
+    assert r2.downloads == []
+
+
+def test_refresh_downloads_only_changed_files(r2):
+    """Test a changed ETag re-downloads just that file."""
+    assert sync.sync() is True
+    r2.downloads.clear()
+    r2.content["states.parquet"] = b"PAR1 states v2 PAR1"
+
+    assert sync.main(["--force"]) == 0
+    assert r2.downloads == ["states.parquet"]
+
+
+def test_refresh_lists_r2_within_sync_ttl(r2, monkeypatch):
+    """Test --force is not swallowed by the skip-listing window after a recent sync."""
+    monkeypatch.setattr(sync, "SYNC_TTL", 3600)
+    assert sync.sync() is True
+    r2.downloads.clear()
+    r2.content["loans.parquet"] = b"PAR1 loans v2 PAR1"
+
+    assert sync.sync(force=True) is True
+    assert r2.downloads == ["loans.parquet"]
+
+
+def test_force_data_refresh_redownloads_everything(r2, monkeypatch):
+    """Test FORCE_DATA_REFRESH ignores the manifest and re-downloads every file."""
+    assert sync.sync() is True
+    r2.downloads.clear()
+    monkeypatch.setattr(sync, "FORCE_REFRESH", True)
+
+    assert sync.sync() is True
+    assert sorted(r2.downloads) == sorted(CONTENT)
@@ -0,0 +1,27 @@
+"""
+Unit tests for shared UI components
+"""
+
+import duckdb
+
+from src.ui import components
+
+
+def test_get_table_info_lists_queryable_table_names(tmp_path, monkeypatch):
+    """Test the data summary shows the view names queries use, with partition sizes summed."""
+    monkeypatch.setenv("COMBINE_PARTITIONED_TABLES", "true")
+    files = []
+    with duckdb.connect() as conn:
+        for stem in ("data_2020Q1", "data_2020Q2", "states"):
+            path = tmp_path / f"{stem}.parquet"
+            conn.execute(f"COPY (SELECT 1 AS id) TO '{path}'")
+            files.append(str(path))
+    components.get_table_info.clear()
+
+    table_info = components.get_table_info(files)
+
+    assert list(table_info) == ["data", "states"]
+    assert (
+        table_info["data"]["size"]
+        == (tmp_path / "data_2020Q1.parquet").stat().st_size + (tmp_path / "data_2020Q2.parquet").stat().st_size
+    )